@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# VagrIRC benchmarks
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+"""Config comment stripping: the old regex chain against virc.lexer.
+
+Run from anywhere with plain python:
+
+    python benchmarks/lexer.py
+
+The regex chain is what the hybrid and plexus4 rule tables used before the
+lexer. Its /* */ pattern backtracks over the rest of the file for every /*
+that is never closed, so adversarial inputs take quadratic time.
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from virc.lexer import strip_config
+
+REGEX_CHAIN = [
+    (re.compile(r'/\*(.|[\r\n])*?\*/'), ''),
+    (re.compile(r'\n\s*//.*'), ''),
+    (re.compile(r'\n\s*#.*'), ''),
+    (re.compile(r'\n(?:\s*\n)+'), r'\n'),
+    (re.compile(r'^[\s\n]*([\S\s]*?)[\s\n]*$'), r'\1\n'),
+]
+
+BLOCK = '''/* serverinfo {}: everything about this server
+ * spread over a few lines
+ */
+serverinfo {{
+    name = "irc{}.example.net";  # shell comment
+    // cpp comment
+    description = "server {}";
+
+    network_name = "MyNet";
+}};
+
+'''
+
+
+def regex_chain(text):
+    for pattern, replacement in REGEX_CHAIN:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def lexer(text):
+    return strip_config(text, cpp_comments=True, shell_comments=True)
+
+
+def timed(function, text):
+    start = time.perf_counter()
+    result = function(text)
+    return result, time.perf_counter() - start
+
+
+def compare(label, text):
+    old, old_time = timed(regex_chain, text)
+    new, new_time = timed(lexer, text)
+    print('{:32} {:>9} bytes  regex {:8.3f}s  lexer {:8.4f}s  same output: {}'.format(
+        label, len(text), old_time, new_time, old == new))
+
+
+def main():
+    for count in [1000, 2000, 4000]:
+        compare('unclosed /* x {}'.format(count), 'a = 1;\n/* x\n' * count)
+
+    for count in [2000, 4000, 8000]:
+        compare('blank runs of {}'.format(count),
+                'a;' + ' \t ' * count + '\n' + 'b;' + ' ' * count)
+
+    config = ''.join(BLOCK.format(i, i, i) for i in range(8000))
+    compare('well-formed config', config)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# VagrIRC benchmarks
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+"""Link info per server: map.link_index against scanning every edge per server.
+
+Run from anywhere with python, with the packages in requirements.txt:
+
+    python benchmarks/link_index.py
+
+Maps are built directly from the map classes: client servers linked in a
+chain plus random cross links, each with a few service bots hanging off
+it. link_index reads each server's adjacency once, so its time per edge
+should stay flat as maps grow. The per-server scan is how link info was
+found before, and is only run on the smaller maps.
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import virc
+from virc import map
+
+BOTS_PER_SERVER = 4
+CROSS_LINKS_PER_SERVER = 2
+SCAN_LIMIT = 1000
+
+
+def build_map(client_count, rng):
+    network = map.IrcNetwork()
+    servers = []
+    for i in range(client_count):
+        server = map.MapClientServer(network, 'hybrid')
+        server.info = {'name': 'irc{}'.format(i)}
+        if servers:
+            server.link_to(servers[-1], {'port': i, 'password': 'pass{}'.format(i)})
+        servers.append(server)
+
+        for j in range(BOTS_PER_SERVER):
+            bot = map.MapServiceBot(network, 'acid')
+            bot.info = {'name': 'bot{}_{}'.format(i, j)}
+            bot.link_to(server, {'port': i, 'password': 'bot{}_{}'.format(i, j)})
+
+    for server in servers:
+        for i in range(CROSS_LINKS_PER_SERVER):
+            remote = rng.choice(servers)
+            if remote is not server:
+                server.link_to(remote, {'port': 0, 'password': 'cross'})
+
+    return network
+
+
+def scan_edges(network):
+    """Find each server's links by looking through every edge, as before."""
+    index = {}
+    for server in network.nodes():
+        links = []
+        for a, b, attributes in network.edges(data=True):
+            if server is not a and server is not b:
+                continue
+            remote = b if server is a else a
+
+            info = dict(attributes)
+            info['remote_name'] = remote.info['name']
+            if not server.client and remote.client:
+                info['server_software'] = remote.software
+            links.append(info)
+        index[server] = links
+    return index
+
+
+def same_links(first, second):
+    def links(index, server):
+        return sorted(sorted(info.items()) for info in index[server])
+
+    return len(first) == len(second) and all(links(first, server) == links(second, server)
+                                             for server in first)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    rng = random.Random(1)
+
+    print('link info for every server')
+    for client_count in [50, 200, 1000, 5000, 20000]:
+        network = build_map(client_count, rng)
+        edges = network.number_of_edges()
+
+        index, index_time = timed(map.link_index, network)
+        line = '{:>7} servers {:>7} links  link_index {:7.3f}s ({:5.2f}us/link)'.format(
+            network.number_of_nodes(), edges, index_time, index_time / edges * 1e6)
+
+        if network.number_of_nodes() <= SCAN_LIMIT:
+            scanned, scan_time = timed(scan_edges, network)
+            line += '  per-server scan {:7.3f}s  same links: {}'.format(
+                scan_time, same_links(index, scanned))
+        print(line)
+
+    print('server_list on generated maps, one hub with N-2 service bots')
+    for bot_count in [100, 1000, 4000]:
+        irc_dir = tempfile.mkdtemp()
+        try:
+            manager = virc.VircManager(irc_dir, seed='benchmark')
+            manager.generate('hybrid', 'anope2', service_bots=['acid'] * bot_count,
+                             sequential=True)
+            servers, list_time = timed(manager.server_list)
+            print('{:>7} servers  server_list {:7.3f}s'.format(len(servers), list_time))
+        finally:
+            shutil.rmtree(irc_dir)
+
+
+if __name__ == '__main__':
+    warnings.simplefilter('ignore')
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# VagrIRC benchmarks
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+"""Seed SQL: one INSERT per row against virc.sql's batched INSERTs.
+
+Run from anywhere with plain python:
+
+    python benchmarks/sql_inserts.py
+
+Rows go into an in-memory SQLite table shaped like acid's access list,
+with INSERT OR IGNORE as acid uses. MySQL isn't needed, but it gains more
+from batching, as each statement is a round trip there.
+"""
+
+import os
+import sys
+import time
+import sqlite3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from virc.sql import insert_statements
+
+SCHEMA = 'CREATE TABLE "access" ("user" TEXT PRIMARY KEY, "flags" INTEGER);'
+
+
+def rows(count):
+    # names with quotes in them, to exercise escaping
+    return [("user{}'s".format(i), i % 4) for i in range(count)]
+
+
+def run(statements):
+    """Return how long the given statements take to run, and the rows they added."""
+    db = sqlite3.connect(':memory:')
+    db.execute(SCHEMA)
+    start = time.perf_counter()
+    for statement in statements:
+        db.execute(statement)
+    db.commit()
+    elapsed = time.perf_counter() - start
+    count = db.execute('SELECT COUNT(*) FROM "access"').fetchone()[0]
+    db.close()
+    return elapsed, count
+
+
+def main():
+    for count in [1000, 10000, 100000]:
+        seed = rows(count)
+        per_row = list(insert_statements('access', ['user', 'flags'], seed, ignore=True,
+                                         dialect='sqlite', batch_rows=1))
+        batched = list(insert_statements('access', ['user', 'flags'], seed, ignore=True,
+                                         dialect='sqlite'))
+
+        per_row_time, per_row_count = run(per_row)
+        batched_time, batched_count = run(batched)
+        print('{:>7} rows  per-row {:7.3f}s ({} statements)  '
+              'batched {:7.3f}s ({} statements)  same rows: {}'.format(
+                  count, per_row_time, len(per_row), batched_time, len(batched),
+                  per_row_count == batched_count == count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library tests
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import sys
+import random
+import string
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from virc import allocate
+from virc.allocate import (SID_SPACE, NameAllocator, PasswordAllocator, PortAllocator,
+                           SidAllocator)
+
+SID_CHARACTERS = string.digits + string.ascii_uppercase
+
+
+class SidAllocatorTest(unittest.TestCase):
+    def test_sequential_order(self):
+        sids = SidAllocator('sequential')
+        taken = [sids.take() for i in range(40)]
+        self.assertEqual(taken[:12], ['000', '001', '002', '003', '004', '005', '006', '007',
+                                      '008', '009', '00A', '00B'])
+        self.assertEqual(taken[35:37], ['00Z', '010'])
+
+    def test_exhaustion(self):
+        for mode in allocate.MODES:
+            sids = SidAllocator(mode, rng=random.Random(1))
+            taken = [sids.take() for i in range(SID_SPACE)]
+
+            self.assertEqual(SID_SPACE, 12960)
+            self.assertEqual(len(set(taken)), SID_SPACE)
+            for sid in taken:
+                self.assertEqual(len(sid), 3)
+                self.assertIn(sid[0], string.digits)
+                self.assertIn(sid[1], SID_CHARACTERS)
+                self.assertIn(sid[2], SID_CHARACTERS)
+
+            with self.assertRaises(Exception) as raised:
+                sids.take()
+            self.assertIn('12960', str(raised.exception))
+
+    def test_preferred(self):
+        sids = SidAllocator('sequential')
+        self.assertEqual(sids.take('002'), '002')
+        self.assertEqual([sids.take() for i in range(3)], ['000', '001', '003'])
+
+        # taken ones aren't handed out again
+        self.assertEqual(sids.take('001'), '004')
+
+    def test_random_is_reproducible(self):
+        first = SidAllocator(rng=random.Random('seed'))
+        second = SidAllocator(rng=random.Random('seed'))
+        self.assertEqual([first.take() for i in range(100)],
+                         [second.take() for i in range(100)])
+
+
+class NameAllocatorTest(unittest.TestCase):
+    def test_sequential_order(self):
+        names = NameAllocator('sequential')
+        self.assertEqual([names.take('hub') for i in range(4)], ['hub', 'hub2', 'hub3', 'hub4'])
+        self.assertEqual(names.take('leaf'), 'leaf')
+        self.assertEqual(names.take('hub2'), 'hub22')
+
+    def test_random_names_are_unique(self):
+        names = NameAllocator(rng=random.Random(1))
+        taken = [names.take('irc') for i in range(2000)]
+        self.assertEqual(len(set(taken)), 2000)
+        self.assertEqual(taken[0], 'irc')
+        self.assertTrue(all(taken))
+
+    def test_fallback_when_names_run_out(self):
+        # every random name is taken already
+        names = NameAllocator(rng=random.Random(1))
+        with mock.patch('virc.allocate.random_name', return_value='Taken'):
+            names.used.add('taken')
+            self.assertEqual([names.take('irc') for i in range(3)], ['irc', 'irc2', 'irc3'])
+
+        # or the names list doesn't have one for the number picked
+        with mock.patch('virc.allocate.random_name', return_value=''):
+            self.assertEqual(names.take('irc'), 'irc4')
+
+
+class PortAllocatorTest(unittest.TestCase):
+    def test_order_and_exhaustion(self):
+        ports = PortAllocator(6667, stop=6669)
+        self.assertEqual([ports.take() for i in range(3)], [6667, 6668, 6669])
+        with self.assertRaises(Exception):
+            ports.take()
+
+
+class PasswordAllocatorTest(unittest.TestCase):
+    def test_sequential_order(self):
+        passwords = PasswordAllocator('sequential', prefix='link')
+        self.assertEqual([passwords.take() for i in range(3)],
+                         ['link_0001', 'link_0002', 'link_0003'])
+
+    def test_random_passwords_are_unique(self):
+        passwords = PasswordAllocator(rng=random.Random(1))
+        taken = [passwords.take() for i in range(5000)]
+        self.assertEqual(len(set(taken)), 5000)
+        self.assertTrue(all(len(password) >= 9 for password in taken))
+
+    def test_fallback_when_random_ones_collide(self):
+        passwords = PasswordAllocator(rng=random.Random(1))
+        with mock.patch('virc.allocate.generate_pass', return_value='same_1234'):
+            self.assertEqual([passwords.take() for i in range(3)],
+                             ['same_1234', 'password_0001', 'password_0002'])
+
+
+class ModeTest(unittest.TestCase):
+    def test_unknown_mode(self):
+        for allocator in [SidAllocator, NameAllocator, PasswordAllocator]:
+            with self.assertRaises(Exception):
+                allocator('shuffled')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library tests
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from virc import anopeconf
+from virc.services.anope2 import Anope2Services
+
+# in the style of anope's data/example.conf, with /* */ comments stripped
+EXAMPLE = '''# the server we link to
+uplink
+{
+	host = "127.0.0.1"
+	ipv6 = no
+	ssl = no
+	port = 6667
+	password = "mypassword"
+}
+
+serverinfo
+{
+	name = "services.localhost.net"
+	description = "Services for IRC Networks"
+	#localhost = "services.localhost.net"
+	#id = "00A"
+	pid = "data/services.pid"
+}
+
+module
+{
+	name = "inspircd20"
+	use_server_side_mlock = yes
+}
+
+networkinfo
+{
+	networkname = "LocalNet"; nicklen = 31
+}
+
+#oper
+{
+	name = "root"
+	type = "Services Root"
+}
+
+module { name = "os_session"; defaultsessionlimit = 3 }
+module { name = "m_ssl_openssl" }
+
+options
+{
+	casemap = "ascii"
+	usemail = yes
+}
+'''
+
+
+class ParseTest(unittest.TestCase):
+    def test_round_trip(self):
+        config = anopeconf.parse(EXAMPLE)
+        self.assertEqual(str(config), EXAMPLE)
+        self.assertEqual([block.type for block in config.blocks()],
+                         ['uplink', 'serverinfo', 'module', 'networkinfo', 'module', 'module',
+                          'options'])
+        self.assertEqual(config.block('uplink').get('port'), '6667')
+        self.assertEqual(config.block('networkinfo').get('nicklen'), '31')
+
+    def test_commented_entries(self):
+        config = anopeconf.parse(EXAMPLE)
+        serverinfo = config.block('serverinfo')
+
+        # commented out entries aren't in effect
+        self.assertIsNone(serverinfo.get('id'))
+        self.assertEqual(serverinfo.entries('id'), [])
+
+        # but setting them turns them back on, in place
+        serverinfo.set('id', anopeconf.quote('0AB'))
+        self.assertEqual(serverinfo.get('id'), '"0AB"')
+        self.assertIn('\t#localhost = "services.localhost.net"\n\tid = "0AB"\n\tpid',
+                      str(config))
+
+        # set on an active entry changes it in place, missing ones are added
+        serverinfo.set('pid', anopeconf.quote('services.pid'))
+        serverinfo.set('motd', anopeconf.quote('services.motd'))
+        self.assertIn('\tpid = "services.pid"\n\tmotd = "services.motd"\n}', str(config))
+        self.assertEqual(str(config).count('#id'), 0)
+
+    def test_unclosed_block(self):
+        with self.assertRaises(Exception) as raised:
+            anopeconf.parse('uplink\n{\n\thost = "127.0.0.1"\n')
+        self.assertIn('never closed', str(raised.exception))
+
+    def test_unquote(self):
+        self.assertEqual(anopeconf.unquote('"a\\"b"'), 'a"b')
+        self.assertEqual(anopeconf.unquote('yes'), 'yes')
+        self.assertIsNone(anopeconf.unquote(None))
+
+
+class EditTest(unittest.TestCase):
+    def test_remove_commented_blocks_and_modules(self):
+        edits = anopeconf.ConfigEdits(remove_commented_blocks=True,
+                                      remove_modules=['os_session'],
+                                      replace_entries=[('usemail', 'yes', 'no')])
+        text = edits(EXAMPLE)
+        config = anopeconf.parse(text)
+
+        self.assertNotIn('#oper', text)
+        self.assertIsNone(config.block('oper'))
+        self.assertNotIn('os_session', text)
+        self.assertEqual([anopeconf.unquote(block.get('name'))
+                          for block in config.blocks('module')], ['inspircd20', 'm_ssl_openssl'])
+        self.assertEqual(config.block('options').get('usemail'), 'no')
+
+        # commented entries inside blocks are left alone
+        self.assertIn('#id = "00A"', text)
+
+    def test_remove_uplink(self):
+        config = anopeconf.parse(EXAMPLE)
+        config.block('uplink').removed = True
+        self.assertIsNone(config.block('uplink'))
+        self.assertNotIn('mypassword', str(config))
+        self.assertTrue(str(config).startswith('# the server we link to\n\nserverinfo\n{'))
+
+    def test_add_blocks(self):
+        config = anopeconf.parse(EXAMPLE)
+        for block in anopeconf.parse_blocks('opertype\n{\n    name = "A"\n}\n'
+                                            'opertype\n{\n    name = "B"\n}\n'):
+            config.append(block)
+        self.assertEqual([block.get('name') for block in config.blocks('opertype')],
+                         ['"A"', '"B"'])
+        self.assertEqual(str(anopeconf.parse(str(config))), str(config))
+
+
+class Anope2ConfigTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+        patcher = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': os.path.join(self.folder,
+                                                                              'cache')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        data_folder = os.path.join(self.folder, 'anope', 'data')
+        os.makedirs(data_folder)
+        for name in ['example.conf', 'operserv.example.conf']:
+            with open(os.path.join(data_folder, name), 'w') as example_file:
+                example_file.write(EXAMPLE)
+
+    def write_config(self, opers):
+        services = Anope2Services()
+        services.source_folder = os.path.join(self.folder, 'anope')
+        services.info = {
+            'name': 'services.example.net',
+            'sid': '0AB',
+            'network_name': 'TestNet',
+            'network_suffix': '.example.net',
+            'links': [{'server_software': 'plexus4', 'port': 10001, 'password': 'linkpass'}],
+        }
+        users = {}
+        for i in range(opers):
+            users['oper{}'.format(i)] = {'level': 'root', 'services': {'password': 'pw'}}
+        users['plain'] = {'ircd': {'oper': True}}
+        users['bot'] = {'services': {'level': 'acid service bot', 'name': 'acidbot'}}
+
+        out = os.path.join(self.folder, 'configs')
+        services.write_config(out, {'users': users})
+        with open(os.path.join(out, 'services.conf')) as config_file:
+            return anopeconf.parse(config_file.read())
+
+    def test_write_config(self):
+        for count in [0, 1, 5]:
+            config = self.write_config(count)
+
+            opers = config.blocks('oper')
+            self.assertEqual(len(opers), count + 1)
+            self.assertEqual(sorted(anopeconf.unquote(block.get('name')) for block in opers),
+                             sorted(['oper{}'.format(i) for i in range(count)] + ['acidbot']))
+            types = [anopeconf.unquote(block.get('type')) for block in opers]
+            self.assertEqual(types.count('Services Root'), count)
+            self.assertEqual(types.count('Acid Service Bot'), 1)
+            for block in opers:
+                self.assertEqual(block.get('vhost'), '"staff.example.net"')
+
+            uplink = config.block('uplink')
+            self.assertEqual(uplink.get('port'), '10001')
+            self.assertEqual(uplink.get('password'), '"linkpass"')
+            self.assertEqual(config.block('serverinfo').get('id'), '"0AB"')
+            self.assertEqual(config.block('serverinfo').get('name'), '"services.example.net"')
+            self.assertEqual([anopeconf.unquote(block.get('name'))
+                              for block in config.blocks('module')], ['plexus', 'm_ssl_openssl'])
+            self.assertEqual(len(config.blocks('opertype')), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
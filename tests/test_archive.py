@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library tests
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from virc.archive import extract_zip
+
+
+class ExtractZipTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def test_zip_without_directory_entries(self):
+        # only file entries, so the extract workers used to race to make
+        #   the same parent folders
+        zip_filename = os.path.join(self.folder, 'release.zip')
+        files = {'README': 'readme\n'}
+        with zipfile.ZipFile(zip_filename, 'w') as release_zip:
+            for i in range(200):
+                name = 'src/mod{}/sub{}/file{}.c'.format(i % 10, i % 3, i)
+                files[name] = 'file {}\n'.format(i) * 50
+            for name, data in files.items():
+                release_zip.writestr('release-1.0/' + name, data)
+
+        with zipfile.ZipFile(zip_filename) as release_zip:
+            self.assertFalse([z for z in release_zip.infolist() if z.is_dir()])
+
+        for run in range(30):
+            out = os.path.join(self.folder, 'out{}'.format(run))
+            os.makedirs(out)
+            extract_zip(zip_filename, out, jobs=8)
+
+            for name, data in files.items():
+                with open(os.path.join(out, name)) as extracted:
+                    self.assertEqual(extracted.read(), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library tests
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from virc.cache import ReleaseCache, file_digest
+
+
+class SharedSizeTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.cache = ReleaseCache(os.path.join(self.folder, 'cache'))
+
+    def add_release(self, key, data, accessed):
+        filename = os.path.join(self.folder, 'release')
+        with open(filename, 'wb') as release_file:
+            release_file.write(data)
+        digest = self.cache.add_blob(filename)
+
+        tree = self.cache.tree_path(digest)
+        if not os.path.exists(tree):
+            os.makedirs(tree)
+            with open(os.path.join(tree, 'README'), 'wb') as readme:
+                readme.write(data)
+
+        sizes = {
+            self.cache.blob_path(digest): len(data),
+            tree: len(data),
+        }
+        self.cache.record(key, {
+            'sha256': digest,
+            'size': sum(sizes.values()),
+            'sizes': sizes,
+        })
+        self.cache.index[key]['accessed'] = accessed
+        self.cache._write_index()
+        return digest
+
+    def test_shared_blob_counted_once(self):
+        self.add_release('hybrid 8.2.0 a', b'x' * 100, 1)
+        self.add_release('hybrid 8.2.0 b', b'x' * 100, 2)
+        self.assertEqual(self.cache.total_size(), 200)
+
+        self.add_release('anope 2.0.2 a', b'y' * 50, 3)
+        self.assertEqual(self.cache.total_size(), 300)
+
+    def test_shared_mirror_counted_once(self):
+        self.cache.record('acid 1 url', {'mirror': 'm', 'worktree': 'w1',
+                                         'sizes': {'m': 100, 'w1': 10}})
+        self.cache.record('acid 2 url', {'mirror': 'm', 'worktree': 'w2',
+                                         'sizes': {'m': 120, 'w2': 10}})
+        self.assertEqual(self.cache.total_size(), 140)
+
+    def test_entries_without_sizes(self):
+        self.cache.record('a', {'sha256': '00', 'size': 100})
+        self.cache.record('b', {'sha256': '00', 'size': 100})
+        self.cache.record('c', {'sha256': '11', 'size': 30})
+        self.assertEqual(self.cache.total_size(), 130)
+
+    def test_evict_under_size(self):
+        self.add_release('hybrid 8.2.0 a', b'x' * 100, 1)
+        self.add_release('hybrid 8.2.0 b', b'x' * 100, 2)
+        self.add_release('anope 2.0.2 a', b'y' * 100, 3)
+
+        self.assertEqual(self.cache.evict(400), [])
+        self.assertEqual(len(self.cache.index), 3)
+
+    def test_evict_shared_frees_nothing(self):
+        digest = self.add_release('hybrid 8.2.0 old', b'x' * 100, 1)
+        self.add_release('hybrid 8.2.0 new', b'x' * 100, 2)
+        self.add_release('anope 2.0.2 a', b'y' * 100, 3)
+
+        # removing the old key keeps the shared files, so it has to keep
+        #   going until something is actually freed
+        removed = self.cache.evict(250)
+        self.assertEqual([key for key, entry in removed],
+                         ['hybrid 8.2.0 old', 'hybrid 8.2.0 new'])
+        self.assertEqual(self.cache.total_size(), 200)
+        self.assertFalse(os.path.exists(self.cache.blob_path(digest)))
+        self.assertFalse(os.path.exists(self.cache.tree_path(digest)))
+
+    def test_evict_keep(self):
+        digest = self.add_release('hybrid 8.2.0 a', b'x' * 100, 1)
+        self.add_release('hybrid 8.2.0 b', b'x' * 100, 2)
+
+        removed = self.cache.evict(0, keep=['hybrid 8.2.0 b'])
+        self.assertEqual([key for key, entry in removed], ['hybrid 8.2.0 a'])
+        self.assertEqual(self.cache.total_size(), 200)
+        self.assertEqual(file_digest(self.cache.blob_path(digest)), digest)
+
+
+if __name__ == '__main__':
+    unittest.main()
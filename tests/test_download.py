@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library tests
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from virc.download import download_file
+
+DATA = bytes(range(256)) * 400
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+
+        if self.server.failures:
+            self.server.failures -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header and self.server.honour_range:
+            start = int(range_header.split('=')[1].rstrip('-'))
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, len(DATA) - 1,
+                                                                      len(DATA)))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(DATA) - start))
+        self.send_header('ETag', '"data"')
+        self.end_headers()
+        self.wfile.write(DATA[start:])
+
+
+class DownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.filename = os.path.join(self.folder, 'release.zip')
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.server.requests = []
+        self.server.honour_range = True
+        self.server.failures = 0
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.url = 'http://127.0.0.1:{}/release.zip'.format(self.server.server_port)
+
+    def write_partial(self, size):
+        with open(self.filename + '.part', 'wb') as part_file:
+            part_file.write(DATA[:size])
+        with open(self.filename + '.part.json', 'w') as sidecar_file:
+            sidecar_file.write(json.dumps({'url': self.url, 'etag': '"data"',
+                                           'size': len(DATA)}))
+
+    def downloaded(self):
+        with open(self.filename, 'rb') as downloaded_file:
+            return downloaded_file.read()
+
+    def test_resume(self):
+        self.write_partial(1000)
+        metrics = download_file(self.url, self.filename, backoff=0)
+
+        self.assertEqual(self.downloaded(), DATA)
+        self.assertEqual(self.server.requests[0].get('Range'), 'bytes=1000-')
+        self.assertEqual(metrics.resumed_from, 1000)
+        self.assertEqual(metrics.bytes, len(DATA) - 1000)
+        self.assertFalse(os.path.exists(self.filename + '.part.json'))
+
+    def test_restart_when_range_ignored(self):
+        self.write_partial(1000)
+        self.server.honour_range = False
+        metrics = download_file(self.url, self.filename, backoff=0)
+
+        self.assertEqual(self.downloaded(), DATA)
+        self.assertEqual(self.server.requests[0].get('Range'), 'bytes=1000-')
+        self.assertEqual(metrics.resumed_from, 0)
+        self.assertEqual(metrics.bytes, len(DATA))
+
+    def test_retry(self):
+        self.server.failures = 2
+        metrics = download_file(self.url, self.filename, backoff=0)
+
+        self.assertEqual(self.downloaded(), DATA)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(metrics.retries, 2)
+        self.assertTrue(metrics.ok)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library tests
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from virc.fetch import fetch_all
+
+
+class FakeDownloader:
+    def __init__(self, name, release):
+        self.name = name
+        self.source_folder = os.path.join('/cache', name, release)
+        self.download_metrics = []
+        self.downloads = 0
+
+    def download_release(self):
+        self.downloads += 1
+        # like a fresh release download, which moves into the cache's trees
+        self.source_folder = os.path.join('/cache/trees', self.name)
+        self.download_metrics.append('metrics')
+
+
+class FetchAllTest(unittest.TestCase):
+    def test_duplicates_fetched_once(self):
+        first = FakeDownloader('hybrid', '8.2.0')
+        second = FakeDownloader('hybrid', '8.2.0')
+        other = FakeDownloader('anope', '2.0.2')
+
+        with mock.patch('builtins.print'):
+            results = fetch_all([first, second, other], jobs=2)
+
+        self.assertEqual(sorted(r.name for r in results), ['anope', 'hybrid'])
+        self.assertEqual(first.downloads + second.downloads, 1)
+        self.assertEqual(other.downloads, 1)
+
+    def test_duplicates_take_fetched_source_folder(self):
+        downloaders = [FakeDownloader('hybrid', '8.2.0') for i in range(3)]
+
+        with mock.patch('builtins.print'):
+            fetch_all(downloaders)
+
+        for downloader in downloaders:
+            self.assertEqual(downloader.source_folder, '/cache/trees/hybrid')
+            self.assertEqual(downloader.download_metrics, ['metrics'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library tests
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from virc import ircdconf
+
+# from ircd-hybrid's doc/reference.conf, with comments stripped
+REFERENCE = '''serverinfo {
+	name = "hades.arpa";
+	sid = "0HY";
+	description = "ircd-hybrid test server";
+	network_name = "MyNet";
+	hub = no;
+	max_clients = 512;
+};
+class {
+	name = "users";
+	ping_time = 90 seconds;
+	sendq = 100 kbytes;
+};
+listen {
+	port = 6665 .. 6669;
+	flags = ssl;
+	host = "192.168.0.1";
+	port = 6697;
+};
+auth {
+	user = "*@172.16.0.0/12";
+	password = "letmein";
+	spoof = "I.still.hate.packets";
+	flags = need_password, spoof_notice, exceed_limit, kline_exempt,
+		gline_exempt, resv_exempt, no_tilde, can_flood;
+};
+auth {
+	user = "*@*";
+	class = "users";
+	flags = need_ident;
+};
+service {
+	name = "service.someserver";
+	name = "stats.someserver";
+};
+resv {
+	mask = "#helsinki";
+	reason = "Channel is reserved for finnish inhabitants";
+	exempt = "*.fi";
+};
+general {
+	throttle_time = 2 seconds;
+	havent_read_conf = 1;
+	message_locale = "standard";
+	oper_umodes = +ac;
+};
+modules {
+	path = "/usr/local/lib/ircd-hybrid/modules";
+	module = "some_module.la";
+};
+'''
+
+
+class ParseTest(unittest.TestCase):
+    def test_round_trip(self):
+        config = ircdconf.parse(REFERENCE)
+        self.assertEqual(str(config), REFERENCE)
+        self.assertEqual(len(config.blocks()), 9)
+        self.assertEqual(len(config.blocks('auth')), 2)
+        self.assertEqual(config.block('serverinfo').get('sid'), '"0HY"')
+        self.assertEqual(config.block('listen').get('port'), '6665 .. 6669')
+        self.assertEqual([entry.value for entry in config.block('service').entries('name')],
+                         ['"service.someserver"', '"stats.someserver"'])
+
+    def test_round_trip_odd_text(self):
+        # text we don't understand is kept as it is
+        for text in ['serverinfo {\n\tname = "a;b{}";\n};\n',
+                     'what is this;\nblock "label" {\n  x = 1;\n  nested { y = 2; };\n};',
+                     'stray }\n', '', '\n\n']:
+            self.assertEqual(str(ircdconf.parse(text)), text)
+
+    def test_unclosed_block(self):
+        with self.assertRaises(Exception) as raised:
+            ircdconf.parse('serverinfo {\n\tname = "hades.arpa";\n')
+        self.assertIn('never closed', str(raised.exception))
+
+        with self.assertRaises(Exception):
+            ircdconf.parse('a {\n\tb {\n\t\tc = 1;\n\t};\n')
+
+    def test_parse_block(self):
+        block = ircdconf.parse_block('connect {\n    name = "x";\n};', leading='\n\n')
+        self.assertEqual(block.type, 'connect')
+        self.assertEqual(block.leading, '\n\n')
+
+        with self.assertRaises(Exception):
+            ircdconf.parse_block('a {\n};\nb {\n};')
+
+
+class EditTest(unittest.TestCase):
+    def test_remove_blocks(self):
+        edits = ircdconf.ConfigEdits(remove_blocks=['listen', 'modules'])
+        config = ircdconf.parse(edits(REFERENCE))
+        self.assertIsNone(config.block('listen'))
+        self.assertIsNone(config.block('modules'))
+        self.assertEqual(len(config.blocks()), 7)
+        self.assertNotIn('6697', str(config))
+
+    def test_remove_blocks_containing(self):
+        edits = ircdconf.ConfigEdits(remove_blocks_containing=[('auth', 'letmein'),
+                                                               ('resv', 'helsinki'),
+                                                               ('class', 'helsinki')])
+        config = ircdconf.parse(edits(REFERENCE))
+        self.assertEqual([block.get('user') for block in config.blocks('auth')], ['"*@*"'])
+        self.assertIsNone(config.block('resv'))
+        self.assertIsNotNone(config.block('class'))
+
+    def test_remove_entries(self):
+        edits = ircdconf.ConfigEdits(remove_entries=[('havent_read_conf', None),
+                                                     ('flags', 'need_ident')])
+        config = ircdconf.parse(edits(REFERENCE))
+        self.assertIsNone(config.block('general').get('havent_read_conf'))
+        self.assertEqual(config.blocks('auth')[1].entries('flags'), [])
+        self.assertIn('need_password', config.blocks('auth')[0].get('flags'))
+
+    def test_replace(self):
+        edits = ircdconf.ConfigEdits(replace_entries=[('hub', 'no', 'yes'),
+                                                      ('throttle_time', '2 seconds', '0'),
+                                                      ('max_clients', '1', '2')],
+                                     replace_in_values=[('someserver', 'example.net')])
+        text = edits(REFERENCE)
+        config = ircdconf.parse(text)
+        self.assertEqual(config.block('serverinfo').get('hub'), 'yes')
+        self.assertEqual(config.block('serverinfo').get('max_clients'), '512')
+        self.assertEqual(config.block('general').get('throttle_time'), '0')
+        self.assertIn('\thub = yes;\n', text)
+        self.assertIn('"stats.example.net"', text)
+
+        # everything else is left as it was
+        self.assertEqual(text.replace('hub = yes', 'hub = no')
+                             .replace('throttle_time = 0', 'throttle_time = 2 seconds')
+                             .replace('example.net', 'someserver'), REFERENCE)
+
+    def test_set(self):
+        config = ircdconf.parse(REFERENCE)
+        serverinfo = config.block('serverinfo')
+
+        # existing key, in place
+        serverinfo.set('name', ircdconf.quote('irc.example.net'))
+        self.assertIn('\tname = "irc.example.net";\n\tsid', str(config))
+
+        # missing key, added to the end of the block
+        serverinfo.set('vhost', ircdconf.quote('127.0.0.1'))
+        self.assertIn('\tmax_clients = 512;\n    vhost = "127.0.0.1";\n};', str(config))
+        self.assertEqual(serverinfo.get('vhost'), '"127.0.0.1"')
+
+        # removed entries are skipped, so setting adds a new one
+        serverinfo.entries('hub')[0].removed = True
+        serverinfo.set('hub', 'yes')
+        self.assertEqual(serverinfo.get('hub'), 'yes')
+        self.assertNotIn('hub = no', str(config))
+
+    def test_insert_after(self):
+        config = ircdconf.parse(REFERENCE)
+        last_auth = config.blocks('auth')[-1]
+        config.insert_after(last_auth, ircdconf.parse_block('connect {\n    name = "x";\n};'))
+
+        types = [block.type for block in config.blocks()]
+        self.assertEqual(types[types.index('auth') + 2], 'connect')
+        self.assertIn('flags = need_ident;\n};\nconnect {\n    name = "x";\n};\nservice',
+                      str(config))
+
+    def test_quote(self):
+        self.assertEqual(ircdconf.quote('a"b\\c'), '"a\\"b\\\\c"')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library tests
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import re
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from virc.lexer import ConfigLexer, strip_config
+
+# the rules strip_config replaced for hybrid and plexus4
+HYBRID_REGEXES = [
+    (re.compile(r'/\*(.|[\r\n])*?\*/'), ''),
+    (re.compile(r'\n\s*//.*'), ''),
+    (re.compile(r'\n\s*#.*'), ''),
+    (re.compile(r'\n(?:\s*\n)+'), r'\n'),
+    (re.compile(r'^[\s\n]*([\S\s]*?)[\s\n]*$'), r'\1\n'),
+]
+
+HYBRID_EXAMPLE = '''/* ircd-hybrid reference configuration file
+ * Copyright (C) 2000-2014 Hybrid Development Team
+ */
+
+serverinfo {
+	/*
+	 * name: the name of this server.
+	 */
+	name = "hades.arpa";
+	# sid: a server's unique ID.
+	sid = "0HY";  /* trailing comment */
+	// network_name: the name of the network.
+	network_name = "MyNet";
+};
+
+
+listen {
+	port = 6665 .. 6669;   
+};
+'''
+
+
+def regex_chain(text):
+    for pattern, replacement in HYBRID_REGEXES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def hybrid(text):
+    return strip_config(text, cpp_comments=True, shell_comments=True)
+
+
+class HybridModeTest(unittest.TestCase):
+    def test_example(self):
+        stripped = hybrid(HYBRID_EXAMPLE)
+        self.assertEqual(stripped, regex_chain(HYBRID_EXAMPLE))
+        self.assertEqual(stripped, 'serverinfo {\n\tname = "hades.arpa";\n\tsid = "0HY";  \n'
+                                   '\tnetwork_name = "MyNet";\n};\nlisten {\n'
+                                   '\tport = 6665 .. 6669;   \n};\n')
+
+    def test_unclosed_c_comment(self):
+        text = 'a = 1;\n/* x\n' * 50
+        self.assertEqual(hybrid(text), regex_chain(text))
+        self.assertEqual(hybrid(text), text)
+
+    def test_comment_markers_in_values(self):
+        text = 'a = "x // y";\nb = "#chan";\nc = "http://z";\n'
+        self.assertEqual(hybrid(text), text)
+        self.assertEqual(hybrid(text), regex_chain(text))
+
+    def test_line_comment_on_first_line(self):
+        # the regexes needed a newline before a line comment
+        for text in ['// top\na;\n', '# top\na;\n', '  # top\na;\n']:
+            self.assertEqual(hybrid(text), 'a;\n')
+            self.assertNotEqual(regex_chain(text), 'a;\n')
+
+    def test_c_comment_inside_line_comment(self):
+        # the regexes removed from the /* to the next */, line comment or not
+        text = 'a;\n// x /* y\nb;\n/* z */\nc;\n'
+        self.assertEqual(hybrid(text), 'a;\nb;\nc;\n')
+        self.assertEqual(regex_chain(text), 'a;\nc;\n')
+
+        text = 'a;\n# x /* y\nb;\n'
+        self.assertEqual(hybrid(text), 'a;\nb;\n')
+
+    def test_only_selected_markers(self):
+        text = 'a;\n# shell\n// cpp\n'
+        self.assertEqual(strip_config(text, cpp_comments=True), 'a;\n# shell\n')
+        self.assertEqual(strip_config(text, shell_comments=True), 'a;\n// cpp\n')
+        self.assertEqual(strip_config(text), 'a;\n# shell\n// cpp\n')
+
+
+class AnopeModeTest(unittest.TestCase):
+    def test_spaced_c_comments(self):
+        text = ('/* top */\na = 1\nb = "x/*y*/" /* c */\nfoo/* not */bar\n\n\n'
+                '  /* multi\n line */ z\n')
+        stripped = strip_config(text, spaced_c_comments=True, collapse=False)
+        self.assertEqual(stripped, '\na = 1\nb = "x/*y*/"\nfoo/* not */bar\n\n\n  z\n')
+
+    def test_collapse_only(self):
+        text = '\n\nx /* kept */\n\n\n  y  \n\n'
+        self.assertEqual(strip_config(text, c_comments=False), 'x /* kept */\n  y\n')
+
+    def test_anope_rules(self):
+        # as used for anope's example.conf, see services.anope2
+        text = '/* header */\n\nuplink\n{\n\t/* where to link */\n\thost = "127.0.0.1"\n}\n\n\n'
+        for rule in [ConfigLexer(spaced_c_comments=True, collapse=False),
+                     ConfigLexer(c_comments=False)]:
+            text = rule(text)
+        self.assertEqual(text, 'uplink\n{\n\thost = "127.0.0.1"\n}\n')
+
+
+class ConfigLexerTest(unittest.TestCase):
+    def test_describe(self):
+        self.assertEqual(ConfigLexer(b=1, a=2).describe(), ConfigLexer(a=2, b=1).describe())
+        self.assertNotEqual(ConfigLexer(a=1).describe(), ConfigLexer(a=2).describe())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library tests
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from virc.materialize import materialize
+from virc.pack import VCS_EXCLUDE
+
+
+def write(filename, data):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'w') as out:
+        out.write(data)
+
+
+class MaterializeTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def test_exclude_vcs_metadata(self):
+        src = os.path.join(self.folder, 'src')
+        dst = os.path.join(self.folder, 'dst')
+
+        # worktree and submodule .git files point into the host's mirror
+        write(os.path.join(src, '.git'), 'gitdir: /host/mirror/worktrees/x\n')
+        write(os.path.join(src, 'lib', 'sub', '.git'), 'gitdir: /host/mirror/modules/sub\n')
+        write(os.path.join(src, 'lib', 'sub', 'sub.c'), 'int sub;\n')
+        write(os.path.join(src, 'src', 'test', 'test.c'), 'int test;\n')
+        write(os.path.join(src, 'main.c'), 'int main;\n')
+
+        # left behind by an earlier write that copied everything
+        write(os.path.join(dst, '.git'), 'gitdir: /host/mirror/worktrees/x\n')
+
+        materialize(src, dst, mode='copy', exclude=VCS_EXCLUDE + ['src/test'])
+
+        self.assertFalse(os.path.lexists(os.path.join(dst, '.git')))
+        self.assertFalse(os.path.lexists(os.path.join(dst, 'lib', 'sub', '.git')))
+        self.assertFalse(os.path.lexists(os.path.join(dst, 'src', 'test')))
+        self.assertTrue(os.path.isfile(os.path.join(dst, 'lib', 'sub', 'sub.c')))
+        self.assertTrue(os.path.isfile(os.path.join(dst, 'main.c')))
+
+    def test_nothing_excluded_by_default(self):
+        src = os.path.join(self.folder, 'src')
+        dst = os.path.join(self.folder, 'dst')
+        write(os.path.join(src, '.git'), 'gitdir: elsewhere\n')
+
+        materialize(src, dst, mode='copy')
+
+        self.assertTrue(os.path.isfile(os.path.join(dst, '.git')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library tests
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+import subprocess
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from virc.base import ReleaseDownloader
+from virc.mirror import checkout_worktree, mirror_folder
+
+
+def git(folder, *args):
+    return subprocess.check_output(['git', '-C', folder, '-c', 'user.name=test',
+                                    '-c', 'user.email=test@example.com'] + list(args),
+                                   stderr=subprocess.DEVNULL).decode().strip()
+
+
+def commit(folder, data):
+    with open(os.path.join(folder, 'README'), 'w') as readme:
+        readme.write(data)
+    git(folder, 'add', 'README')
+    git(folder, 'commit', '-q', '-m', data)
+    return git(folder, 'rev-parse', 'HEAD')
+
+
+class MirrorTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+        patcher = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': os.path.join(self.folder,
+                                                                              'cache')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.upstream = os.path.join(self.folder, 'upstream')
+        os.makedirs(self.upstream)
+        git(self.upstream, 'init', '-q')
+
+        class Software(ReleaseDownloader):
+            name = 'testsoft'
+            vcs = 'git'
+            url = self.upstream
+            _slug_type = 'server'
+
+        self.software_class = Software
+
+    def download(self, git_commit, offline=False):
+        software = self.software_class()
+        software.git_commit = git_commit
+        software.offline = offline
+        software.download_release()
+        return software
+
+    def test_offline_pinned_commit_not_in_mirror(self):
+        first = commit(self.upstream, 'first')
+        software = self.download(first)
+        with open(os.path.join(software.source_folder, 'README')) as readme:
+            self.assertEqual(readme.read(), 'first')
+
+        # cached already, so this works offline
+        self.download(first, offline=True)
+
+        second = commit(self.upstream, 'second')
+        with self.assertRaises(Exception) as raised:
+            self.download(second, offline=True)
+        self.assertIn('testsoft', str(raised.exception))
+        self.assertIn('without --offline', str(raised.exception))
+
+        software = self.download(second)
+        with open(os.path.join(software.source_folder, 'README')) as readme:
+            self.assertEqual(readme.read(), 'second')
+
+    def test_checkout_missing_commit(self):
+        commit(self.upstream, 'first')
+        software = self.download(None)
+        mirror = mirror_folder(software.base_cache_directory, self.upstream)
+
+        with self.assertRaises(Exception) as raised:
+            checkout_worktree(mirror, software.source_folder, ref='0' * 40)
+        self.assertIn('0' * 40, str(raised.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library tests
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from virc.output import MANIFEST_FILENAME, Generations, OutputManifest
+
+
+def write(filename, data):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'w') as out:
+        out.write(data)
+
+
+def read(filename):
+    with open(filename) as infile:
+        return infile.read()
+
+
+class GenerationsTest(unittest.TestCase):
+    symlinks = True
+
+    def setUp(self):
+        self.irc_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.irc_dir)
+        self.generations = Generations(self.irc_dir, names=['configs'])
+        if not self.symlinks:
+            self.generations._symlinks = False
+
+    def write_generation(self, data):
+        staging = self.generations.stage()
+        outputs = OutputManifest(self.generations.current())
+        write(os.path.join(staging, 'configs', 'ircd.conf'), data)
+        outputs.sync(os.path.join(staging, 'configs'), 'configs')
+        outputs.save(staging)
+        self.generations.commit(staging)
+        self.assertFalse(os.path.exists(staging))
+
+    def live(self):
+        return read(os.path.join(self.irc_dir, 'configs', 'ircd.conf'))
+
+    def test_commit_and_rollback(self):
+        self.write_generation('one')
+        self.assertEqual(self.live(), 'one')
+        self.assertIsNone(self.generations.previous())
+
+        self.write_generation('two')
+        self.assertEqual(self.live(), 'two')
+        self.assertTrue(os.path.isfile(os.path.join(self.generations.current(), MANIFEST_FILENAME)))
+
+        self.generations.rollback()
+        self.assertEqual(self.live(), 'one')
+        self.generations.rollback()
+        self.assertEqual(self.live(), 'two')
+
+        self.write_generation('three')
+        self.assertEqual(read(os.path.join(self.generations.previous(), 'configs',
+                                           'ircd.conf')), 'two')
+
+    def test_prune_removes_stale_staging(self):
+        self.write_generation('one')
+
+        # as left by a write that crashed
+        stale = self.generations.stage()
+        write(os.path.join(stale, 'configs', 'ircd.conf'), 'partial')
+
+        self.generations.prune()
+        self.assertFalse(os.path.exists(stale))
+        self.assertEqual(self.live(), 'one')
+
+
+class PlainFolderGenerationsTest(GenerationsTest):
+    symlinks = False
+
+    def test_output_folders_are_plain(self):
+        self.write_generation('one')
+        self.write_generation('two')
+        self.assertFalse(os.path.islink(os.path.join(self.irc_dir, 'configs')))
+        self.assertFalse(os.path.lexists(os.path.join(self.irc_dir, 'current')))
+
+
+if __name__ == '__main__':
+    unittest.main()
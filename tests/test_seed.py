@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library tests
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from virc import VircManager
+
+PYVA_CONFIG = '''clients:
+- nick: LimitServ
+  user: limitserv
+- nick: Trivia
+  user: trivia
+'''
+
+MOO_CONFIG = '''general:
+  nick: moo
+  ident: moo
+  oper:
+    name: moo
+    pass: operpass
+'''
+
+
+class SeedTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+        patcher = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': os.path.join(self.folder,
+                                                                              'cache')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # just the files the service bots read their users from
+        self.sources = {
+            'acid': os.path.join(self.folder, 'acid'),
+            'moo': os.path.join(self.folder, 'moo'),
+        }
+        os.makedirs(os.path.join(self.sources['acid'], 'pyva'))
+        with open(os.path.join(self.sources['acid'], 'pyva', 'pyva.example.yml'), 'w') as f:
+            f.write(PYVA_CONFIG)
+        os.makedirs(self.sources['moo'])
+        with open(os.path.join(self.sources['moo'], 'moo.yml.template'), 'w') as f:
+            f.write(MOO_CONFIG)
+
+    def users(self, manager):
+        """Return the users every server declares, as init_info sees them."""
+        server_list = manager.server_list()
+        for node, server in server_list:
+            if node.software in self.sources:
+                server.source_folder = self.sources[node.software]
+        return manager.info_from_server_list(server_list)['users']
+
+    def generate(self, name, seed):
+        manager = VircManager(os.path.join(self.folder, name), seed=seed)
+        manager.generate('plexus4', 'anope2', service_bots=['acid', 'moo'],
+                         opers=[('dan', 'pw')])
+        with open(manager.serial_filename) as map_file:
+            return manager, map_file.read()
+
+    def test_same_seed(self):
+        first, first_map = self.generate('first', 'seed')
+        second, second_map = self.generate('second', 'seed')
+
+        self.assertEqual(first_map, second_map)
+
+        users = self.users(first)
+        self.assertEqual(users, self.users(second))
+        for nick in ['LimitServ', 'Trivia', 'moo']:
+            self.assertTrue(users[nick]['services']['password'])
+        self.assertTrue(users['moo']['ircd']['oper_pass'])
+
+        # the seed is saved in the map, so writes from it later match too
+        reloaded = VircManager(os.path.join(self.folder, 'first'))
+        reloaded.load_network_map()
+        self.assertEqual(reloaded.seed, 'seed')
+        self.assertEqual(self.users(reloaded), users)
+
+    def test_different_seed(self):
+        first, first_map = self.generate('first', 'seed')
+        second, second_map = self.generate('second', 'other seed')
+
+        self.assertNotEqual(first_map, second_map)
+        self.assertNotEqual(self.users(first)['LimitServ']['services']['password'],
+                            self.users(second)['LimitServ']['services']['password'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library tests
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from virc import templates
+from virc.templates import STALE_TMP_AGE, TemplateCache
+
+RULES = [('MyNet', 'TestNet')]
+
+
+class TemplateCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.directory = os.path.join(self.folder, 'templates')
+
+    def template(self, name, size):
+        filename = os.path.join(self.folder, name)
+        with open(filename, 'w') as template_file:
+            template_file.write(name + ' MyNet ' + 'x' * size)
+        return filename
+
+    def test_get(self):
+        cache = TemplateCache(self.directory)
+        filename = self.template('ircd.conf', 10)
+        self.assertEqual(cache.get(filename, RULES), 'ircd.conf TestNet ' + 'x' * 10)
+
+        # a new cache reads it back from disk
+        self.assertEqual(len(TemplateCache(self.directory).entries()), 1)
+        self.assertEqual(TemplateCache(self.directory).get(filename, RULES),
+                         'ircd.conf TestNet ' + 'x' * 10)
+
+    def test_evict_least_recently_used(self):
+        cache = TemplateCache(self.directory, max_size=2500)
+        first = self.template('first.conf', 1000)
+        cache.get(first, RULES)
+        cache.get(self.template('second.conf', 1000), RULES)
+
+        # use the first one again in a later run, so the second is the oldest
+        for filename, size, used in cache.entries():
+            os.utime(filename, (time.time() - 100, time.time() - 100))
+        TemplateCache(self.directory).get(first, RULES)
+
+        cache.get(self.template('third.conf', 1000), RULES)
+        stored = []
+        for filename, size, used in cache.entries():
+            with open(filename) as stored_file:
+                stored.append(stored_file.read().split()[0])
+        self.assertEqual(sorted(stored), ['first.conf', 'third.conf'])
+        self.assertLessEqual(cache.total_size(), 2500)
+
+    def test_evict_removes_stale_tmp_files(self):
+        os.makedirs(self.directory)
+        stale = os.path.join(self.directory, 'stale.conf.1-1.tmp')
+        fresh = os.path.join(self.directory, 'fresh.conf.1-2.tmp')
+        for filename in [stale, fresh]:
+            open(filename, 'w').close()
+        old = time.time() - STALE_TMP_AGE - 10
+        os.utime(stale, (old, old))
+
+        TemplateCache(self.directory).evict(0)
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(fresh))
+
+    def test_shared_cache_size(self):
+        shared = templates.template_cache()
+        self.addCleanup(setattr, shared, 'max_size', shared.max_size)
+
+        self.assertIs(templates.template_cache(max_size=1024), shared)
+        self.assertEqual(shared.max_size, 1024)
+        self.assertEqual(templates.template_cache().max_size, 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -22,7 +22,9 @@ all once it's online.
 
 Usage:
     vagrirc.py generate (--oper <name:password>)... [options]
-    vagrirc.py write
+    vagrirc.py write [options]
+    vagrirc.py rollback
+    vagrirc.py cache (stats | prune | verify) [options]
     vagrirc.py (list | list-software)
     vagrirc.py (-h | --help)
     vagrirc.py --version
@@ -34,9 +36,25 @@ Options:
     --rizon                      Setup a network with Rizon's services, ircd, and bots.
     --with-moo                   Include moo while setting up a Rizon network.
     (--oper <name:password>)...  Make an oper / opers with the given names and passwords.
+    --sequential                 Give out server names, SIDs and link passwords in order.
+    --seed <seed>                Seed random names, SIDs and passwords, for reproducible outputs.
+    --jobs <n>                   Number of packages to download at once [default: 4].
+    --git-depth <n>              Only fetch this many commits of git-based software.
+    --blobless                   Fetch file contents of git-based software on demand.
+    --ttl <seconds>              Seconds before git-based software is fetched again [default: 3600].
+    --offline                    Only use already-downloaded source code.
+    --cache-size <mb>            Trim the download cache to this size [default: 2048].
+    --template-cache-size <mb>   Keep the stripped config template cache under this size [default: 64].
+    --link-mode <mode>           Place source files by copy, reflink or hardlink [default: reflink].
+    --packed                     Write one archive per software, unpacked on the guest to build.
+    --render-jobs <n>            Number of configs to write at once, 0 for one per cpu [default: 0].
+    --mirror <locations>         Folders / urls to try before upstream (separated by comma <,>).
     -h, --help                   Show this screen
     --version                    Show VagrIRC version
 """
+import os
+import time
+
 from docopt import docopt
 import virc
 
@@ -44,7 +62,7 @@ if __name__ == '__main__':
     arguments = docopt(__doc__, version=virc.name_version)
 
     if arguments['generate']:
-        manager = virc.VircManager()
+        manager = virc.VircManager(seed=arguments['--seed'])
         ircd = arguments['--ircd']
         services = arguments['--services']
         service_bots = arguments.get('--service-bots', '')
@@ -68,16 +86,81 @@ if __name__ == '__main__':
         ]
 
         manager.generate(ircd_type=ircd, services_type=services, service_bots=service_bots,
-                         opers=oper_usernames_and_passwords, name=name, suffix=suffix)
+                         opers=oper_usernames_and_passwords, name=name, suffix=suffix,
+                         sequential=arguments['--sequential'])
 
     elif arguments['write']:
-        manager = virc.VircManager()
+        virc.templates.template_cache(
+            max_size=int(arguments['--template-cache-size']) * 1024 * 1024)
+        manager = virc.VircManager(seed=arguments['--seed'])
         manager.load_network_map()
-        manager.download_source()
-        manager.write_server_configs()
-        manager.write_source_files()
-        manager.write_build_files()
-        manager.write_init_files()
+        git_depth = arguments['--git-depth']
+        mirrors = arguments['--mirror'] or os.environ.get('VAGRIRC_MIRROR', '')
+        manager.download_source(jobs=int(arguments['--jobs']),
+                                git_depth=int(git_depth) if git_depth else None,
+                                git_filter='blob:none' if arguments['--blobless'] else None,
+                                cache_ttl=int(arguments['--ttl']),
+                                offline=arguments['--offline'],
+                                mirrors=[m for m in mirrors.split(',') if m],
+                                cache_size=int(arguments['--cache-size']) * 1024 * 1024)
+        with manager.staged_outputs():
+            manager.write_server_configs(jobs=int(arguments['--render-jobs']))
+            manager.write_source_files(mode=arguments['--link-mode'],
+                                       packed=arguments['--packed'])
+            manager.write_build_files(packed=arguments['--packed'])
+            manager.write_init_files()
+
+    elif arguments['rollback']:
+        manager = virc.VircManager()
+        manager.rollback_outputs()
+
+    elif arguments['cache']:
+        release_cache = virc.cache.release_cache()
+        cache_size = int(arguments['--cache-size']) * 1024 * 1024
+        template_cache_size = int(arguments['--template-cache-size']) * 1024 * 1024
+        template_cache = virc.templates.template_cache(max_size=template_cache_size)
+
+        if arguments['stats']:
+            entries = sorted(release_cache.index.items(),
+                             key=lambda item: item[1].get('accessed', 0), reverse=True)
+
+            print('Download cache:', release_cache.directory)
+            print('  {} entries, {} of {}'.format(len(entries),
+                                                  virc.utils.human_size(release_cache.total_size()),
+                                                  virc.utils.human_size(cache_size)))
+
+            print('\n** Most recently used first **')
+            for key, entry in entries:
+                age = (time.time() - entry.get('accessed', 0)) / (60 * 60 * 24)
+                print('  {} {} : {}, last used {:.1f} days ago'.format(
+                    entry.get('software'), entry.get('release'),
+                    virc.utils.human_size(entry.get('size', 0)), age))
+                if 'sha256' in entry:
+                    print('    sha256', entry['sha256'])
+
+            print('\nTemplate cache:', template_cache.directory)
+            print('  {} entries, {} of {}'.format(len(template_cache.entries()),
+                                                  virc.utils.human_size(template_cache.total_size()),
+                                                  virc.utils.human_size(template_cache_size)))
+
+        elif arguments['prune']:
+            removed = release_cache.evict(cache_size)
+            for key, entry in removed:
+                print('Removed {} {} ({})'.format(entry.get('software'), entry.get('release'),
+                                                  virc.utils.human_size(entry.get('size', 0))))
+            print('Cache is now', virc.utils.human_size(release_cache.total_size()))
+
+            removed = template_cache.evict(template_cache_size)
+            print('Removed {} templates ({}), template cache is now {}'.format(
+                len(removed), virc.utils.human_size(sum(size for filename, size in removed)),
+                virc.utils.human_size(template_cache.total_size())))
+
+        elif arguments['verify']:
+            problems = release_cache.verify()
+            for key, problem in problems:
+                print('Removed broken entry [{}]: {}'.format(key, problem))
+            print('{} broken entr{} found'.format(len(problems),
+                                                 'y' if len(problems) == 1 else 'ies'))
 
     elif arguments['list'] or arguments['list-software']:
         manager = virc.VircManager()
@@ -14,20 +14,28 @@
 import os
 import json
 import random
-import string
 import shutil
 import inspect
+import contextlib
 
-import names
 import networkx as nx
 import matplotlib.pyplot as plt
 
 from . import map
+from . import allocate
+from . import cache
+from . import fetch
+from . import materialize
+from . import pack
+from . import output
+from . import render
+from . import templates
+from . import backends
 from . import serial
 from . import servers
 from . import services
 from . import service_bots
-from .utils import nodelist, generate_pass
+from .utils import nodelist, human_size
 
 version = '0.0.1'
 name_version = 'VagrIRC {}'.format(version)
@@ -40,9 +48,12 @@ INIT_FILE_TEMPLATE = '''#!/usr/bin/env python3
 class VircManager:
     """Can create and map out an IRC network."""
 
-    def __init__(self, irc_dir=None):
+    def __init__(self, irc_dir=None, seed=None):
         self.network = None
 
+        # seeds every random name, SID and password, for reproducible outputs
+        self.seed = seed
+
         if irc_dir is None:
             irc_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'irc'))
         self.irc_dir = irc_dir
@@ -52,6 +63,7 @@ class VircManager:
 
         self.map_filename = os.path.join(self.irc_dir, 'Server Map.pdf')
         self.serial_filename = os.path.join(self.irc_dir, 'map.yaml')
+        self.download_metrics_filename = os.path.join(self.irc_dir, 'download_metrics.json')
         self.configs_base_dir = os.path.join(self.irc_dir, 'configs')
         self.build_base_dir = os.path.join(self.irc_dir, 'build')
         self.launch_base_dir = os.path.join(self.irc_dir, 'launch')
@@ -59,13 +71,42 @@ class VircManager:
         self.src_base_dir = os.path.join(self.irc_dir, 'src')
         self.bin_base_dir = os.path.join(self.irc_dir, 'bin')
 
+        self.generations = output.Generations(self.irc_dir)
+        self.outputs = None
+        # built once per network map, see _network_changed
+        self._link_index = None
+        self._servers = None
+        self._staging = None
+        self._staged = {}
+
     def save_network_map(self):
         with open(self.serial_filename, 'w') as serial_file:
             serial_file.write(serial.dump(self.network))
 
+    def _network_changed(self):
+        """Forget everything we've worked out from the old network map."""
+        self._link_index = None
+        self._servers = None
+
     def load_network_map(self):
         with open(self.serial_filename, 'r') as serial_file:
             self.network = serial.load(serial_file.read())
+        self._network_changed()
+
+        # reuse the seed the map was generated with, unless we were given one
+        if self.seed is None:
+            self.seed = self.network.info.get('seed')
+
+    def rng_seed(self, *names):
+        """Return the seed for the random values named by `names`, or None."""
+        if self.seed is None:
+            return None
+        return ':'.join(str(part) for part in (self.seed,) + names)
+
+    def rng(self, *names):
+        """Return a random.Random for the given names, or the random module if unseeded."""
+        seed = self.rng_seed(*names)
+        return random if seed is None else random.Random(seed)
 
     def supported_software(self):
         """Reply with a dict of supported software."""
@@ -98,25 +139,121 @@ class VircManager:
 
         return sw
 
-    def download_source(self):
-        """Download source code."""
+    def download_source(self, jobs=fetch.DEFAULT_JOBS, git_depth=None, git_filter=None,
+                        cache_ttl=None, offline=False, mirrors=None, cache_size=None):
+        """Download source code.
+
+        `mirrors` is a list of local folders or urls to check before
+        downloading from upstream. If `cache_size` is given, the release cache
+        is trimmed to that many bytes afterwards, least recently used first.
+        """
+        sources = backends.backends_for(mirrors) if mirrors else None
+
+        downloaders = []
         for node, server in self.server_list():
-            server.download_release()
+            if git_depth is not None:
+                server.git_depth = git_depth
+            if git_filter is not None:
+                server.git_filter = git_filter
+            if cache_ttl is not None:
+                server.cache_ttl = cache_ttl
+            server.offline = offline
+            if sources is not None:
+                server.backends = sources
+            downloaders.append(server)
+
+        results = fetch.fetch_all(downloaders, jobs=jobs)
+
+        fetch.report_metrics(results)
+        fetch.write_metrics(results, self.download_metrics_filename)
+
+        failed = [result for result in results if not result.ok]
+        if failed:
+            raise Exception('Could not download: {}'.format(
+                ', '.join('{} ({})'.format(r.name, r.error) for r in failed)))
+
+        # trim the cache, but never throw out what we've just downloaded
+        if cache_size is not None:
+            release_cache = cache.release_cache()
+            removed = release_cache.evict(cache_size,
+                                          keep=set(d.cache_key() for d in downloaders))
+            for key, entry in removed:
+                print('Removed {} {} from the cache ({})'.format(entry.get('software'),
+                                                                 entry.get('release'),
+                                                                 human_size(entry.get('size', 0))))
+
+    @contextlib.contextmanager
+    def staged_outputs(self):
+        """Write every output written inside this block as one new generation.
+
+        Outputs are rendered into a staging folder, and swapped in all at once
+        when the block finishes, see output.Generations. Outputs that weren't
+        written inside the block are carried over from the live generation.
+        """
+        if self._staging is not None:
+            yield
+            return
+
+        self._staging = self.generations.stage()
+        self._staged = {}
+        self.outputs = output.OutputManifest(self.generations.current())
+        try:
+            yield
+
+            for name in self.generations.names:
+                if name not in self._staged:
+                    self.outputs.carry_over(self._staging, name)
+
+            # nothing to swap in, leave the live and previous generations be
+            if self.outputs.changed():
+                self.outputs.save(self._staging)
+                self.generations.commit(self._staging)
+            self.outputs.report()
+        finally:
+            if os.path.exists(self._staging):
+                shutil.rmtree(self._staging)
+            self._staging = None
+            self._staged = {}
+
+    @contextlib.contextmanager
+    def _render(self, output_dir):
+        """Yield the staging folder to render the given output folder into."""
+        name = os.path.relpath(output_dir, self.irc_dir)
+        with self.staged_outputs():
+            folder = os.path.join(self._staging, name)
+            if os.path.exists(folder):
+                shutil.rmtree(folder)
+            os.makedirs(folder)
+
+            yield folder
+
+            self.outputs.sync(folder, name)
+            self._staged[name] = folder
+
+    def rollback_outputs(self):
+        """Go back to the previous generation of outputs."""
+        folder = self.generations.rollback()
+        if self.generations.symlinks:
+            print('Rolled back to generation', os.path.basename(folder))
+        else:
+            print('Rolled back to the previous outputs')
 
     def write_init_files(self):
         """Write necessary init files for our software."""
-        # remove old config files
-        if os.path.exists(self.init_base_dir):
-            shutil.rmtree(self.init_base_dir)
+        with self._render(self.init_base_dir) as init_base_dir:
+            self._write_init_files(init_base_dir)
+
+    def _write_init_files(self, init_base_dir):
         init_base = os.path.join('environment', 'init_base')  # XXX - dodgy
-        shutil.copytree(init_base, self.init_base_dir)
+        shutil.copytree(init_base, init_base_dir, dirs_exist_ok=True,
+                        ignore=shutil.ignore_patterns('__pycache__'))
 
         # info
         server_list = self.server_list()
         info = self.info_from_server_list(server_list)
 
         # users
-        host_init_users_file = os.path.join(self.init_base_dir, 'users.json')
+        host_init_users_file = os.path.join(init_base_dir, 'users.json')
         users = []
 
         for node, server in server_list:
@@ -132,15 +269,17 @@ class VircManager:
             users_file.write(json.dumps(users, sort_keys=True, indent=4,
                                         separators=(',', ': ')))
 
-    def write_build_files(self):
-        """Write necessary build files for our software."""
-        # remove old config files
-        if os.path.exists(self.build_base_dir):
-            shutil.rmtree(self.build_base_dir)
-        os.makedirs(self.build_base_dir)
-        if os.path.exists(self.launch_base_dir):
-            shutil.rmtree(self.launch_base_dir)
-        os.makedirs(self.launch_base_dir)
+    def write_build_files(self, packed=False):
+        """Write necessary build files for our software.
+
+        If `packed` is True, sources are unpacked from the archives written by
+        write_source_files onto guest-local disk and built from there.
+        """
+        with self._render(self.build_base_dir) as build_base_dir, \
+                self._render(self.launch_base_dir) as launch_base_dir:
+            self._write_build_files(build_base_dir, launch_base_dir, packed)
+
+    def _write_build_files(self, build_base_dir, launch_base_dir, packed):
 
         # build file links
         build_files = []
@@ -148,10 +287,13 @@ class VircManager:
         launch_rest_files = []
 
         for node, server in self.server_list():
-            server_build_folder = os.path.join(self.build_base_dir, server.slug)
-            server_launch_folder = os.path.join(self.launch_base_dir, server.slug)
+            server_build_folder = os.path.join(build_base_dir, server.slug)
+            server_launch_folder = os.path.join(launch_base_dir, server.slug)
             server_bin_folder = os.path.join('/irc/bin', server.slug)
-            server_src_folder = os.path.join('/irc/src', server.slug)
+            if packed:
+                server_src_folder = os.path.join(pack.GUEST_SRC_BASE, server.slug)
+            else:
+                server_src_folder = os.path.join('/irc/src', server.slug)
             guest_build_folder = os.path.join('/irc/build', server.slug)
             guest_config_folder = os.path.join('/irc/configs', server.slug)
 
@@ -166,7 +308,12 @@ class VircManager:
 
             if bf:
                 build_file = os.path.join('/irc/build', server.slug, 'build')
-                build_files.append(build_file)
+                if packed:
+                    archive = os.path.join('/irc/src', server.slug + pack.ARCHIVE_EXTENSION)
+                    unpack = pack.unpack_commands(archive, server_src_folder)
+                else:
+                    unpack = []
+                build_files.append((build_file, unpack))
 
             # launch folder
             os.makedirs(server_launch_folder)
@@ -191,109 +338,176 @@ class VircManager:
                     launch_rest_files.append(launch_file)
 
         # write build files
-        with open(os.path.join(self.build_base_dir, 'build'), 'w') as build_file:
+        with open(os.path.join(build_base_dir, 'build'), 'w') as build_file:
             build_file.write('#!/usr/bin/env sh\n')
-            for filename in build_files:
+            for filename, unpack in build_files:
+                for line in unpack:
+                    build_file.write(line + '\n')
                 build_file.write('chmod +x ' + filename + '\n')
                 build_file.write(filename + '\n')
 
         # write launch files
-        with open(os.path.join(self.launch_base_dir, 'launch_core'), 'w') as launch_file:
+        with open(os.path.join(launch_base_dir, 'launch_core'), 'w') as launch_file:
             launch_file.write('#!/usr/bin/env sh\n')
             for filename in launch_core_files:
                 launch_file.write('chmod +x ' + filename + '\n')
                 launch_file.write(filename + '\n')
 
-        with open(os.path.join(self.launch_base_dir, 'launch_rest'), 'w') as launch_file:
+        with open(os.path.join(launch_base_dir, 'launch_rest'), 'w') as launch_file:
             launch_file.write('#!/usr/bin/env sh\n')
             for filename in launch_rest_files:
                 launch_file.write('chmod +x ' + filename + '\n')
                 launch_file.write(filename + '\n')
 
-    def write_source_files(self):
-        """Write software files."""
+    def write_source_files(self, mode=materialize.DEFAULT_MODE, packed=False):
+        """Write software files.
+
+        Only files that have changed since the last write are touched, and
+        they're reflinked or hardlinked from the cache where possible, see
+        materialize.Materializer. VCS metadata and the software's `pack_exclude`
+        patterns are left out.
+
+        If `packed` is True, each piece of software is instead written as a
+        single archive, along with a manifest describing them.
+        """
+        server_list = self.server_list()
+
+        if not os.path.exists(self.src_base_dir):
+            os.makedirs(self.src_base_dir)
+
         # remove old source files
-        if os.path.exists(self.src_base_dir):
-            shutil.rmtree(self.src_base_dir)
-        os.makedirs(self.src_base_dir)
+        if packed:
+            wanted = set(server.slug + pack.ARCHIVE_EXTENSION for node, server in server_list)
+            wanted.add(pack.MANIFEST_FILENAME)
+        else:
+            wanted = set(server.slug for node, server in server_list)
+        for name in os.listdir(self.src_base_dir):
+            if name not in wanted:
+                path = os.path.join(self.src_base_dir, name)
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+
+        if packed:
+            self._write_packed_source_files(server_list)
+            return
 
         # write software folders
-        for node, server in self.server_list():
+        materializer = materialize.Materializer(mode)
+        for node, server in server_list:
             src_folder = os.path.join(self.src_base_dir, server.slug)
 
-            shutil.copytree(server.source_folder, src_folder)
+            # worktree .git files point into the mirror on this machine, so VCS
+            #   metadata is left out just like when packing
+            materializer.materialize(server.source_folder, src_folder,
+                                     exclude=pack.VCS_EXCLUDE + server.pack_exclude)
 
-    def write_server_configs(self):
-        """Write config files for all our servers."""
-        # remove old config files
-        if os.path.exists(self.configs_base_dir):
-            shutil.rmtree(self.configs_base_dir)
-        os.makedirs(self.configs_base_dir)
+        print('Source files:', ', '.join('{} {}'.format(count, name) for name, count
+                                         in sorted(materializer.stats.items())))
 
-        # write new config files
-        server_list = self.server_list()
-        info = self.info_from_server_list(server_list)
+    def _write_packed_source_files(self, server_list):
+        manifest_filename = os.path.join(self.src_base_dir, pack.MANIFEST_FILENAME)
+        old_manifest = pack.read_manifest(manifest_filename)
+        manifest = {}
+        packed_count = 0
 
         for node, server in server_list:
-            server_config_folder = os.path.join(self.configs_base_dir, server.slug)
-            os.makedirs(server_config_folder)
+            archive_name = server.slug + pack.ARCHIVE_EXTENSION
+            archive_filename = os.path.join(self.src_base_dir, archive_name)
+
+            files = pack.source_files(server.source_folder,
+                                      exclude=pack.VCS_EXCLUDE + server.pack_exclude)
+            fingerprint = pack.fingerprint(files)
+
+            # only repack when the source has changed
+            old_entry = old_manifest.get(server.slug, {})
+            if old_entry.get('fingerprint') != fingerprint or not os.path.exists(archive_filename):
+                pack.write_archive(files, archive_filename)
+                packed_count += 1
+
+            manifest[server.slug] = {
+                'software': server.name,
+                'release': server.release,
+                'archive': archive_name,
+                'fingerprint': fingerprint,
+                'files': len(files),
+                'size': pack.total_size(files),
+                'archive_size': os.path.getsize(archive_filename),
+                'exclude': pack.VCS_EXCLUDE + server.pack_exclude,
+            }
+
+        pack.write_manifest(manifest_filename, manifest)
+
+        print('Source archives: {} packed, {} unchanged'.format(packed_count,
+                                                                 len(manifest) - packed_count))
+
+    def write_server_configs(self, jobs=None):
+        """Write config files for all our servers.
 
-            server.write_config(server_config_folder, info)
+        Configs are written by `jobs` processes at once, one per cpu by default.
+        """
+        with self._render(self.configs_base_dir) as configs_base_dir:
+            self._write_server_configs(configs_base_dir, jobs)
 
-        # some info can only be obtained after the config files have been
-        #   written, so we write them twice after getting new server info
+    def _write_server_configs(self, configs_base_dir, jobs=None):
+        # every server declares its users, passwords, etc up front, so each
+        #   config file only needs to be written once, and independently
         server_list = self.server_list()
         info = self.info_from_server_list(server_list)
 
-        svr = []
-
+        render_jobs = []
         for node, server in server_list:
-            # do client server last
-            if node.client:
-                svr = [node, server]
-                continue
-
-            server_config_folder = os.path.join(self.configs_base_dir, server.slug)
-            shutil.rmtree(server_config_folder)
+            server_config_folder = os.path.join(configs_base_dir, server.slug)
             os.makedirs(server_config_folder)
 
-            server.write_config(server_config_folder, info)
+            render_jobs.append(render.render_job(server, server_config_folder, info))
 
-        # do client server last, since some info is regenerated in the write_config stage,
-        #   and this messes us up when we try to do dynamic oper passwords
-        node, server = svr
+        results = render.render_all(render_jobs, workers=jobs)
 
-        server_config_folder = os.path.join(self.configs_base_dir, server.slug)
-        shutil.rmtree(server_config_folder)
-        os.makedirs(server_config_folder)
-
-        info = self.info_from_server_list(server_list)
-
-        server.write_config(server_config_folder, info)
+        failed = [result for result in results if not result.ok]
+        for result in failed:
+            print(result.trace)
+        if failed:
+            raise Exception('Could not write configs: {}'.format(
+                ', '.join('{} ({})'.format(r.slug, r.error) for r in failed)))
 
     def info_from_server_list(self, server_list):
-        """Return info and server list."""
+        """Return network info, with the users every server declares."""
         info = dict(self.network.info)
+        info['users'] = dict(info.get('users', {}))
 
         for node, server in server_list:
-            server_config_folder = os.path.join(self.configs_base_dir, server.slug)
-            server.init_info(config_folder=server_config_folder)
+            server.init_info()
 
-            info['users'].update(server.info['users'])
+            info['users'].update(server.info.get('users', {}))
 
         return info
 
+    def links(self, node):
+        """Return the info of each of the given node's links, see map.link_index."""
+        if self._link_index is None:
+            self._link_index = map.link_index(self.network)
+        return self._link_index.get(node, [])
+
     def server_list(self):
-        srv_list = []
+        """Return a list of (node, software) for every node running software.
+
+        The software is only created once per network map, so every phase
+        works on the same objects and sees the same state.
+        """
+        if self._servers is None:
+            self._servers = []
 
-        for node in self.network.nodes():
-            server = self.node_to_server(node)
-            if server:
-                server.slug = '{}_{}'.format(server._slug_type, node.software)
+            for node in self.network.nodes():
+                server = self.node_to_server(node)
+                if server:
+                    server.slug = '{}_{}'.format(server._slug_type, node.software)
+                    server.seed_rng(self.rng_seed('server', node.info['sid']))
 
-                srv_list.append((node, server))
+                    self._servers.append((node, server))
 
-        return srv_list
+        return list(self._servers)
 
     def node_to_server(self, node):
         # create server
@@ -311,47 +525,32 @@ class VircManager:
         server.info['network_suffix'] = self.network.info['suffix']
         server.info['network_name'] = self.network.info['name']
 
-        server.info['links'] = []
-        for link in self.network.edges():
-            # only write link info for this node
-            if link[0] != node and link[1] != node:
-                continue
-
-            base_info = nx.get_edge_attributes(self.network, link)
-            if not base_info:
-                base_info = nx.get_edge_attributes(self.network, (link[1], link[0]))
-
-            try:
-                link_info = base_info[link]
-            except KeyError:
-                link_info = base_info[(link[1], link[0])]
-
-            info = {k: v for (k, v) in link_info}
-
-            if link[0] == node:
-                info['remote_name'] = link[1].info['name']
-            elif link[1] == node:
-                info['remote_name'] = link[0].info['name']
-
-            if not node.client:
-                if link[0].client:
-                    info['server_software'] = link[0].software
-                elif link[1].client:
-                    info['server_software'] = link[1].software
-
-            server.info['links'].append(info)
+        server.info['links'] = [dict(info) for info in self.links(node)]
 
         return server
 
     def generate(self, ircd_type=None, services_type=None, use_services=True,
-                 service_bots=[], opers=[], name="VagrIRC", suffix='.dnt'):
-        """Generate the given IRC server map."""
+                 service_bots=[], opers=[], name="VagrIRC", suffix='.dnt', sequential=False,
+                 seed=None):
+        """Generate the given IRC server map.
+
+        If `sequential` is set, server names, SIDs and link passwords are
+        handed out in order rather than randomly, see allocate. If `seed` is
+        given, they and every other random value come from it, and it's
+        saved in the map so later writes use it too.
+        """
+        if seed is not None:
+            self.seed = seed
+
         self.network = map.IrcNetwork()
+        self._network_changed()
         self.network.info = {
             'users': {},
             'name': name,
             'suffix': suffix,
         }
+        if self.seed is not None:
+            self.network.info['seed'] = self.seed
 
         # set network info, opers etc
         for name, password in opers:
@@ -389,10 +588,15 @@ class VircManager:
         # server and link info
         # # # #
 
+        mode = 'sequential' if sequential else 'random'
+        rng = self.rng('generate')
+        server_names = allocate.NameAllocator(mode, rng=rng)
+        sids = allocate.SidAllocator(mode, rng=rng)
+        passwords = allocate.PasswordAllocator(mode, rng=rng, prefix='link')
+
         # assign server names and client ports
-        current_client_port = 6667
-        used_names = []
-        used_sids = []
+        client_ports = allocate.PortAllocator(6667)
+        client_count = len([server for server in self.network.nodes() if server.client])
 
         for server in self.network.nodes():
             info = {
@@ -401,54 +605,36 @@ class VircManager:
 
             # generate name
             if server.services:
-                server_name = 'services'
+                server_name = server_names.take('services')
             else:
-                server_name = server.software
-            while server_name in used_names:
-                server_name = names.get_first_name().lower()
-            used_names.append(server_name)
+                server_name = server_names.take(server.software)
 
             info['name'] = server_name + suffix
 
             # generate sid
-            sid = '72A'
-            while sid in used_sids:
-                sid = '{}{}{}'.format(random.randint(0, 9), random.randint(0, 9),
-                                      random.choice(string.ascii_uppercase))
-            used_sids.append(sid)
-
-            info['sid'] = sid
+            info['sid'] = sids.take('72A')
 
             # port for clients to connect on
             if server.client:
-                info['client_port'] = current_client_port
-                current_client_port += 1
+                info['client_port'] = client_ports.take()
 
             # and set info
             server.info = info
 
         # assign ports and passwords for server links
         current_link_port = 10000
-        while current_link_port <= current_client_port:
+        while current_link_port <= 6667 + client_count:
             current_link_port += 500
-
-        used_passwords = []
+        link_ports = allocate.PortAllocator(current_link_port)
 
         for link in self.network.edges():
-            info = []
+            attributes = self.network[link[0]][link[1]]
 
             # port for things to connect on
-            info.append(('port', current_link_port))
-            current_link_port += 1
+            attributes['port'] = link_ports.take()
 
             # generate link password
-            password = generate_pass()
-            while password in used_passwords:
-                password = generate_pass()
-
-            info.append(('password', password))
-
-            nx.set_edge_attributes(self.network, link, info)
+            attributes['password'] = passwords.take()
 
         # save network map
         self.save_network_map()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+"""Hand out unique server names, SIDs, ports and passwords.
+
+Each allocator keeps what it's handed out in a set, so taking a value is
+O(1) however many have been taken. In `sequential` mode values are handed
+out in a fixed order, in `random` mode they're picked with the given
+random.Random (or the random module).
+"""
+
+import random
+import string
+
+from .utils import generate_pass, random_name
+
+MODES = ['random', 'sequential']
+
+# TS6 SIDs are a digit followed by two digits or uppercase letters
+SID_FIRST = string.digits
+SID_REST = string.digits + string.ascii_uppercase
+SID_SPACE = len(SID_FIRST) * len(SID_REST) ** 2
+
+# times we try a random name or password before falling back to numbering them
+RANDOM_TRIES = 8
+
+
+def _check_mode(mode):
+    if mode not in MODES:
+        raise Exception('Unknown allocation mode: [{}]'.format(mode))
+
+
+def _shuffled_indexes(size, rng):
+    """Yield each of range(size) once, in random order, in O(1) per index.
+
+    This is a Fisher-Yates shuffle done lazily, only remembering the
+    positions it has swapped.
+    """
+    swaps = {}
+    for i in range(size):
+        j = rng.randrange(i, size)
+        yield swaps.get(j, j)
+        swaps[j] = swaps.get(i, i)
+
+
+def sid_for_index(index):
+    """Return the SID at the given position in the SID space."""
+    index, last = divmod(index, len(SID_REST))
+    first, middle = divmod(index, len(SID_REST))
+    return SID_FIRST[first] + SID_REST[middle] + SID_REST[last]
+
+
+class SidAllocator:
+    """Unique TS6 server IDs."""
+
+    def __init__(self, mode='random', rng=random):
+        _check_mode(mode)
+        self.used = set()
+        if mode == 'random':
+            self._indexes = _shuffled_indexes(SID_SPACE, rng)
+        else:
+            self._indexes = iter(range(SID_SPACE))
+
+    def take(self, preferred=None):
+        """Return a new SID, the preferred one if it's free."""
+        if preferred is not None and preferred not in self.used:
+            self.used.add(preferred)
+            return preferred
+
+        # SIDs given out as preferred ones get skipped, at most once each
+        for index in self._indexes:
+            sid = sid_for_index(index)
+            if sid not in self.used:
+                self.used.add(sid)
+                return sid
+
+        raise Exception('All {} server IDs have been used'.format(SID_SPACE))
+
+
+class NameAllocator:
+    """Unique server names."""
+
+    def __init__(self, mode='random', rng=random):
+        _check_mode(mode)
+        self.mode = mode
+        self.rng = rng
+        self.used = set()
+        self._counts = {}
+
+    def _numbered(self, base):
+        count = self._counts.get(base, 1)
+        name = base
+        while name in self.used:
+            count += 1
+            name = '{}{}'.format(base, count)
+        self._counts[base] = count
+        return name
+
+    def take(self, preferred):
+        """Return a new name, the preferred one if it's free."""
+        name = preferred
+        if name in self.used:
+            if self.mode == 'random':
+                for i in range(RANDOM_TRIES):
+                    name = random_name('first', rng=self.rng).lower()
+                    if name and name not in self.used:
+                        break
+            if not name or name in self.used:
+                name = self._numbered(preferred)
+
+        self.used.add(name)
+        return name
+
+
+class PortAllocator:
+    """Unique ports, handed out in order."""
+
+    def __init__(self, start, stop=65535):
+        self.next = start
+        self.stop = stop
+
+    def take(self):
+        """Return the next free port."""
+        if self.next > self.stop:
+            raise Exception('All ports up to {} have been used'.format(self.stop))
+        port = self.next
+        self.next += 1
+        return port
+
+
+class PasswordAllocator:
+    """Unique passwords."""
+
+    def __init__(self, mode='random', rng=random, prefix='password'):
+        _check_mode(mode)
+        self.mode = mode
+        self.rng = rng
+        self.prefix = prefix
+        self.used = set()
+        self._count = 0
+
+    def take(self):
+        """Return a new password."""
+        if self.mode == 'random':
+            for i in range(RANDOM_TRIES):
+                password = generate_pass(rng=self.rng)
+                if password not in self.used:
+                    self.used.add(password)
+                    return password
+
+        while True:
+            self._count += 1
+            password = '{}_{:04}'.format(self.prefix, self._count)
+            if password not in self.used:
+                self.used.add(password)
+                return password
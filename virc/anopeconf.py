@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+"""Parser and serializer for anope style config files.
+
+These look like:
+
+    serverinfo
+    {
+        name = "services.localhost.net"
+        #id = "00A"
+    }
+
+Entries end at a newline or `;`, and `#` starts a comment. Blocks and
+entries commented out with a `#` right before their name are parsed too, so
+they can be removed or turned back on. This builds on the ircdconf classes,
+and like them an unedited config serializes back to exactly what was
+parsed. /* */ comments should be stripped first, see lexer.ConfigLexer.
+"""
+
+import re
+
+from . import ircdconf
+from .ircdconf import Config, Text, quote
+
+_SPACE = re.compile(r'\s*')
+_LINE_SPACE = re.compile(r'[^\S\n]*')
+_WORD = re.compile(r'#?[A-Za-z0-9_.:\-]+')
+_VALUE = re.compile(r'"(?:[^"\\]|\\.)*"|[^\s;#{}"]*')
+_END = re.compile(r'(?:[^\S\n]*;)?')
+_COMMENT = re.compile(r'[^\n]*')
+_JUNK = re.compile(r'[^\n;{}]*;?')
+
+
+def unquote(value):
+    """Return the string inside the given quoted config value."""
+    if value is None or not value.startswith('"'):
+        return value
+    return re.sub(r'\\(.)', r'\1', value[1:-1])
+
+
+class _Commentable:
+    commented = False
+
+    @property
+    def active(self):
+        return not self.removed and not self.commented
+
+
+class Entry(_Commentable, ircdconf.Entry):
+    """A `key = value` entry."""
+
+    def __init__(self, key, value, raw=None, leading='\n\t', commented=False):
+        self.commented = commented
+        super().__init__(key, value, raw=raw, leading=leading)
+
+    def _format(self):
+        return '{}{} = {}'.format('#' if self.commented else '', self.key, self._value)
+
+
+class Block(_Commentable, ircdconf.Block):
+    """A `type { ... }` block."""
+
+    def __init__(self, block_type, items=(), header=None, closing='\n}', leading='\n',
+                 commented=False):
+        self.commented = commented
+        if header is None:
+            header = '{}{}\n{{'.format('#' if commented else '', block_type)
+        super().__init__(block_type, items, header=header, closing=closing, leading=leading)
+
+    def set(self, key, value):
+        """Set the value of the first entry with the given key.
+
+        If the entry is only there commented out, it's turned back on.
+        Otherwise a new entry is added.
+        """
+        entries = self._entries.get(key, [])
+        for entry in entries:
+            if entry.active:
+                entry.value = value
+                return entry
+        for entry in entries:
+            if not entry.removed:
+                entry.commented = False
+                entry.value = value
+                return entry
+        return self.append(Entry(key, value))
+
+
+def _parse_items(text, i, top):
+    items = []
+    length = len(text)
+
+    while True:
+        start = _SPACE.match(text, i).end()
+        leading = text[i:start]
+
+        if start == length:
+            if not top:
+                raise Exception('Config block was never closed')
+            return items, leading, start
+
+        if text[start] == '}' and not top:
+            return items, text[i:start + 1], start + 1
+
+        word = _WORD.match(text, start)
+        if word:
+            name = word.group()
+            commented = name.startswith('#')
+            key = name.lstrip('#')
+
+            # block
+            pos = _SPACE.match(text, word.end()).end()
+            if text.startswith('{', pos):
+                block_items, closing, i = _parse_items(text, pos + 1, False)
+                items.append(Block(key, block_items, header=text[start:pos + 1],
+                                   closing=closing, leading=leading, commented=commented))
+                continue
+
+            # entry
+            pos = _LINE_SPACE.match(text, word.end()).end()
+            if text.startswith('=', pos):
+                value = _VALUE.match(text, _LINE_SPACE.match(text, pos + 1).end())
+                i = _END.match(text, value.end()).end()
+                items.append(Entry(key, value.group(), raw=text[start:i], leading=leading,
+                                   commented=commented))
+                continue
+
+        # comments, and things we don't understand, are kept as they are
+        if text[start] == '#':
+            end = _COMMENT.match(text, start).end()
+        else:
+            end = _JUNK.match(text, start).end()
+            if end == start:
+                end += 1
+        items.append(Text(text[start:end], leading=leading))
+        i = end
+
+
+def parse(text):
+    """Parse the given config file text into a Config."""
+    items, trailing, i = _parse_items(text, 0, True)
+    return Config(items, trailing=trailing)
+
+
+def parse_blocks(text, leading='\n'):
+    """Parse the given text of some blocks into a list of Blocks."""
+    blocks = parse(text).blocks()
+    for block in blocks:
+        block.leading = leading
+    return blocks
+
+
+def parse_block(text, leading='\n'):
+    """Parse the given text of a single block into a Block."""
+    blocks = parse_blocks(text, leading=leading)
+    if len(blocks) != 1:
+        raise Exception('Expected a single config block, found {}'.format(len(blocks)))
+    return blocks[0]
+
+
+class ConfigEdits:
+    """A rule for templates.apply_rules that edits the config structurally.
+
+    - `remove_commented_blocks`: remove top-level blocks that are commented out.
+    - `remove_modules`: names of module blocks to remove.
+    - `replace_entries`: (key, old value, new value) for every block.
+    - `replace_in_values`: (old, new) text to replace in every entry value.
+    """
+    version = 1
+
+    def __init__(self, remove_commented_blocks=False, remove_modules=(), replace_entries=(),
+                 replace_in_values=()):
+        self.remove_commented_blocks = remove_commented_blocks
+        self.remove_modules = list(remove_modules)
+        self.replace_entries = list(replace_entries)
+        self.replace_in_values = list(replace_in_values)
+
+    def apply(self, config):
+        if self.remove_commented_blocks:
+            for item in config.items:
+                if isinstance(item, Block) and item.commented:
+                    item.removed = True
+
+        for block in config.blocks('module'):
+            if unquote(block.get('name')) in self.remove_modules:
+                block.removed = True
+
+        for key, old, new in self.replace_entries:
+            config.replace_entries(key, old, new)
+
+        for old, new in self.replace_in_values:
+            config.replace_in_values(old, new)
+
+    def __call__(self, text):
+        config = parse(text)
+        self.apply(config)
+        return str(config)
+
+    def describe(self):
+        return ['anopeconf', self.version, self.remove_commented_blocks, self.remove_modules,
+                self.replace_entries, self.replace_in_values]
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import queue
+import tarfile
+import threading
+from zipfile import ZipFile
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils import get_members
+
+EXTRACT_JOBS = 4
+
+# tarfile stream modes for each archive type we can extract
+TAR_MODES = {
+    'tar': 'r|',
+    'tar.gz': 'r|gz',
+    'tgz': 'r|gz',
+    'tar.xz': 'r|xz',
+    'txz': 'r|xz',
+    'tar.bz2': 'r|bz2',
+    'tbz2': 'r|bz2',
+}
+
+
+def archive_type(url):
+    """Return the archive type of the given url, eg 'zip' or 'tar.gz'."""
+    for ext in sorted(list(TAR_MODES) + ['zip'], key=len, reverse=True):
+        if url.endswith('.' + ext):
+            return ext
+
+    if len(url.split('.')) > 1:
+        return url.rsplit('.', 1)[-1]
+
+
+def is_tar(download_type):
+    return download_type in TAR_MODES
+
+
+def _extract_tar(tar, folder):
+    if hasattr(tarfile, 'data_filter'):
+        tar.extractall(folder, filter='data')
+    else:
+        tar.extractall(folder)
+
+
+def common_root(folder):
+    """Return the folder inside the given one that holds all of its contents.
+
+    This is the tar equivalent of get_members, which strips the common
+    directory prefix from zip files.
+    """
+    while True:
+        entries = os.listdir(folder)
+        if len(entries) != 1:
+            return folder
+
+        inner = os.path.join(folder, entries[0])
+        if not os.path.isdir(inner) or os.path.islink(inner):
+            return folder
+        folder = inner
+
+
+def extract_tar(filename, folder, download_type):
+    """Extract the given tar file into the given folder."""
+    with tarfile.open(filename, TAR_MODES[download_type].replace('|', ':')) as tar:
+        _extract_tar(tar, folder)
+
+
+def _member_path(folder, name):
+    """Return where ZipFile.extract puts the given member name in the given folder."""
+    parts = os.path.splitdrive(name.replace('/', os.path.sep))[1].split(os.path.sep)
+    parts = [part for part in parts if part not in ('', os.path.curdir, os.path.pardir)]
+    return os.path.join(folder, *parts)
+
+
+def extract_zip(filename, folder, jobs=EXTRACT_JOBS):
+    """Extract the given zip file into the given folder, using several threads.
+
+    Common directory prefixes are stripped, see get_members.
+    """
+    with ZipFile(filename, 'r') as source_zip:
+        members = list(get_members(source_zip))
+
+    # make every folder up front, zips don't have to list them and the
+    #   workers would race each other making them
+    files = []
+    for zipinfo in members:
+        if zipinfo.is_dir():
+            os.makedirs(_member_path(folder, zipinfo.filename), exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(_member_path(folder, zipinfo.filename)), exist_ok=True)
+            files.append(zipinfo)
+
+    # spread files over the workers so each one gets a similar amount of data
+    buckets = [[] for i in range(max(1, jobs))]
+    sizes = [0] * len(buckets)
+    for zipinfo in sorted(files, key=lambda z: z.file_size, reverse=True):
+        smallest = sizes.index(min(sizes))
+        buckets[smallest].append(zipinfo)
+        sizes[smallest] += zipinfo.file_size
+
+    def extract_bucket(bucket):
+        # each thread gets its own handle, zlib releases the gil while inflating
+        with ZipFile(filename, 'r') as source_zip:
+            for zipinfo in bucket:
+                source_zip.extract(zipinfo, folder)
+
+    with ThreadPoolExecutor(max_workers=len(buckets)) as executor:
+        for result in executor.map(extract_bucket, [b for b in buckets if b]):
+            pass
+
+
+def extract(filename, folder, download_type):
+    """Extract the given archive into the given folder."""
+    if download_type == 'zip':
+        extract_zip(filename, folder)
+    elif is_tar(download_type):
+        extract_tar(filename, folder, download_type)
+    else:
+        raise Exception('Cannot extract/parse given download type')
+
+
+class _QueueReader:
+    """File-like object that reads the blocks put into a queue."""
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.buffer = b''
+        self.offset = 0
+        self.eof = False
+
+    def read(self, size=-1):
+        while not self.eof and (size < 0 or len(self.buffer) - self.offset < size):
+            block = self.blocks.get()
+            if block is None:
+                self.eof = True
+            else:
+                self.buffer = self.buffer[self.offset:] + block
+                self.offset = 0
+
+        if size < 0:
+            size = len(self.buffer) - self.offset
+        data = self.buffer[self.offset:self.offset + size]
+        self.offset += len(data)
+        return data
+
+
+class StreamingExtractor:
+    """Extracts a tar archive in the background as its bytes arrive.
+
+    Blocks are given to `feed` in order. If the stream can't be completed,
+    eg because a download had to be resumed part-way through, `abort` is
+    called and the archive should be extracted from the file instead.
+    """
+
+    def __init__(self, folder, download_type):
+        self.folder = folder
+        self.mode = TAR_MODES[download_type]
+        self.aborted = False
+        self.error = None
+
+        self._blocks = queue.Queue(maxsize=16)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            with tarfile.open(fileobj=_QueueReader(self._blocks), mode=self.mode) as tar:
+                _extract_tar(tar, self.folder)
+        except Exception as ex:
+            self.error = ex
+            self.aborted = True
+
+    def _put(self, block):
+        # if extraction stops early we stop waiting on the queue
+        while self._thread.is_alive():
+            try:
+                self._blocks.put(block, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def feed(self, block):
+        if not self.aborted:
+            self._put(block)
+
+    def abort(self):
+        if not self.aborted:
+            self.aborted = True
+            self._put(None)
+        self._thread.join()
+
+    def finish(self):
+        """Wait for extraction to finish, returning True if it succeeded."""
+        if not self.aborted:
+            self._put(None)
+        self._thread.join()
+        return not self.aborted and self.error is None
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import time
+import shutil
+
+from .download import DownloadError, DownloadMetrics, download_file
+
+
+def _release_path(downloader, url):
+    """Return the path a release is stored under on a mirror.
+
+    Releases are laid out as `<software>/<release>/<archive filename>`, and
+    git repositories as `<software>.git`.
+    """
+    filename = url.rstrip('/').rsplit('/', 1)[-1]
+    return '/'.join([downloader.name, str(downloader.release), filename])
+
+
+class ArtifactBackend:
+    """Somewhere we can get release archives and git repositories from."""
+    name = None
+
+    def fetch(self, downloader, url, filename, stream=None):
+        """Fetch the given release url into the given filename.
+
+        Returns False if this backend doesn't have the release, and raises
+        DownloadError if it does but fetching it failed. Metrics for the
+        download are added to the downloader's `download_metrics` list.
+        """
+        return False
+
+    def git_url(self, downloader):
+        """Return the url to fetch the given git-based software from, or None."""
+        return None
+
+
+class UpstreamBackend(ArtifactBackend):
+    """The url each piece of software declares."""
+    name = 'upstream'
+
+    def fetch(self, downloader, url, filename, stream=None):
+        metrics = DownloadMetrics(url, source=self.name)
+        downloader.download_metrics.append(metrics)
+
+        download_file(url, filename, stream=stream, metrics=metrics)
+        return True
+
+    def git_url(self, downloader):
+        return downloader.url
+
+
+class LocalDirectoryBackend(ArtifactBackend):
+    """A local (or network-mounted) directory laid out like a mirror."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.name = self.path
+
+    def fetch(self, downloader, url, filename, stream=None):
+        local_filename = os.path.join(self.path, *_release_path(downloader, url).split('/'))
+        if not os.path.isfile(local_filename):
+            return False
+
+        if stream is not None:
+            stream.abort()
+
+        metrics = DownloadMetrics(local_filename, source=self.name)
+        downloader.download_metrics.append(metrics)
+
+        start = time.time()
+        shutil.copyfile(local_filename, filename)
+        metrics.elapsed = time.time() - start
+        metrics.time_to_first_byte = 0.0
+        metrics.bytes = os.path.getsize(filename)
+        metrics.ok = True
+        return True
+
+    def git_url(self, downloader):
+        local_repo = os.path.join(self.path, downloader.name + '.git')
+        if os.path.isdir(local_repo):
+            return local_repo
+
+
+class HttpMirrorBackend(ArtifactBackend):
+    """A plain HTTP server laid out like a mirror."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.name = self.base_url
+
+    def fetch(self, downloader, url, filename, stream=None):
+        mirror_url = '/'.join([self.base_url, _release_path(downloader, url)])
+        metrics = DownloadMetrics(mirror_url, source=self.name)
+        downloader.download_metrics.append(metrics)
+
+        try:
+            download_file(mirror_url, filename, stream=stream, metrics=metrics)
+        except DownloadError as ex:
+            if ex.status == 404:
+                return False
+            raise
+        return True
+
+    def git_url(self, downloader):
+        return '/'.join([self.base_url, downloader.name + '.git'])
+
+
+def backend_for(location):
+    """Return the backend for the given mirror location, either a url or a path."""
+    if location.startswith(('http://', 'https://')):
+        return HttpMirrorBackend(location)
+    return LocalDirectoryBackend(location)
+
+
+def backends_for(locations):
+    """Return the backends to try, in order, for the given mirror locations."""
+    return [backend_for(location) for location in locations] + [UpstreamBackend()]
@@ -12,12 +12,19 @@
 # <http://creativecommons.org/publicdomain/zero/1.0/>.
 
 import os
-from zipfile import ZipFile
+import time
+import random
+import shutil
 
-import appdirs
-import requests
+from .archive import StreamingExtractor, archive_type, common_root, extract, is_tar
+from .backends import UpstreamBackend
+from .cache import base_directory, folder_size, make_key, release_cache
+from .download import DownloadError, DownloadMetrics
+from .mirror import (UPSTREAM_HEAD, mirror_folder, update_mirror, checkout_worktree,
+                     has_commit, worktree_commit)
 
-from .utils import get_members
+DEFAULT_CACHE_TTL = 60 * 60
+DEFAULT_BACKENDS = [UpstreamBackend()]
 
 
 class ReleaseDownloader:
@@ -26,6 +33,15 @@ class ReleaseDownloader:
     release = None
     vcs = None
     url = None
+    # expected sha256 of the downloaded release archive. verification is opt-in,
+    #   releases without one are trusted as downloaded and their digest printed
+    sha256 = None
+    git_depth = None  # shallow clone depth, for git-based software
+    git_filter = None  # partial clone filter, eg 'blob:none'
+    git_commit = None  # pin git-based software to this commit
+    cache_ttl = DEFAULT_CACHE_TTL  # seconds before git-based software is fetched again
+    offline = False  # only use what's already cached
+    backends = DEFAULT_BACKENDS  # where we download releases from, in order
     _download_type = None
     _slug_type = None
 
@@ -33,9 +49,7 @@ class ReleaseDownloader:
         if self.name is None:
             raise Exception('Class variable `name` must be overridden')
 
-        appname = 'vagrirc'
-        appauthor = 'danieloaks'
-        self.base_cache_directory = appdirs.user_cache_dir(appname, appauthor)
+        self.base_cache_directory = base_directory()
 
         # server_* slug here to stop possible collisions with services/etc names
         slug = '{}_{}'.format(self._slug_type, self.name)
@@ -44,83 +58,218 @@ class ReleaseDownloader:
             self.release = 'trunk'
         self.source_folder = os.path.join(self.cache_directory, self.release)
         self.external_source_folder = self.name
+        self.download_metrics = []
 
         if not os.path.exists(self.cache_directory):
             os.makedirs(self.cache_directory)
 
+        # content-addressed store for downloaded releases
+        self.cache = release_cache()
+
         # fill out dl type ourselves if we can
         if self._download_type is None:
-            if isinstance(self.url, str) and len(self.url.split('.')) > 1:
+            if isinstance(self.url, str):
                 # could also strip out # magic if necessary, later
-                self._download_type = self.url.rsplit('.', 1)[-1]
+                self._download_type = archive_type(self.url)
+
+        # releases we've already downloaded live in the release cache
+        if not self.vcs and self.url is not None:
+            entry = self.cache.lookup(self.cache_key())
+            if entry is not None:
+                self.source_folder = self.cache.tree_path(entry['sha256'])
+
+    def cache_key(self):
+        """Return the key our release is stored under in the release cache."""
+        url = self.url
+        if url is not None and not self.vcs:
+            url = url.format(release=self.release)
+        return make_key(self.name, self.release, str(url))
 
     def download_release(self):
         """Download our expected release of the server, if not already cached."""
         if self.vcs == 'git':
-            import git
-
-            if os.path.exists(self.source_folder):
-                print('Updating', self.name)
-                repo = git.Repo(self.source_folder)
-                repo.remotes.origin.fetch()
-                repo.remotes.origin.pull()
+            mirror = mirror_folder(self.base_cache_directory, self.url)
+            key = self.cache_key()
+            entry = dict(self.cache.index.get(key, {}))
+
+            if self.git_commit:
+                ref = self.git_commit
+                # pinned commits never change, so we only need them to exist
+                fresh = has_commit(mirror, self.git_commit)
             else:
-                repo = git.Repo.init(self.source_folder)
-                origin = repo.create_remote('origin', self.url)
-                assert origin.exists()
-                origin.fetch()
-                # track remote branch
-                repo.create_head('master', origin.refs.master).set_tracking_branch(
-                    origin.refs.master)
-                origin.pull()
-
-            for submodule in repo.submodules:
-                submodule.update(init=True)
-
-            repo.heads.master.checkout()
+                ref = UPSTREAM_HEAD
+                age = time.time() - entry.get('fetched', 0)
+                fresh = os.path.exists(mirror) and 0 <= age < self.cache_ttl
+
+            if not fresh:
+                if self.offline:
+                    if not os.path.exists(mirror):
+                        raise Exception('{} is not cached and we are offline'.format(self.name))
+                    if self.git_commit:
+                        raise Exception('{} is pinned to commit {}, which is not in its cached '
+                                        'mirror. Run once without --offline to fetch it'
+                                        ''.format(self.name, self.git_commit))
+                    print('Offline, using cached', self.name)
+                else:
+                    if os.path.exists(mirror):
+                        print('Updating', self.name)
+
+                    self._update_mirror(mirror)
+                    entry['fetched'] = time.time()
+
+            # only touch the worktree if what we want isn't already checked out
+            wanted = self.git_commit or entry.get('commit')
+            if not fresh or wanted is None or worktree_commit(self.source_folder) != wanted:
+                entry['commit'] = checkout_worktree(mirror, self.source_folder, ref=ref)
+
+            if not fresh or 'sizes' not in entry:
+                entry['sizes'] = {
+                    mirror: folder_size(mirror),
+                    self.source_folder: folder_size(self.source_folder),
+                }
+                entry['size'] = sum(entry['sizes'].values())
+
+            entry.update({
+                'software': self.name,
+                'release': self.release,
+                'url': self.url,
+                'vcs': self.vcs,
+                'mirror': mirror,
+                'worktree': self.source_folder,
+            })
+            self.cache.record(key, entry)
 
         else:
             if self.url is None:
                 return False
 
             # see if it already exists
-            if os.path.exists(self.source_folder):
-                return True
-
             url = self.url.format(release=self.release)
+            key = self.cache_key()
+            entry = self.cache.lookup(key)
+            if entry is not None:
+                self.source_folder = self.cache.tree_path(entry['sha256'])
+                self.cache.touch(key)
+                return True
 
-            # download file
-            tmp_with_ext = 'tmp_download.{}'.format(self._download_type)
-            tmp_filename = os.path.join(self.cache_directory, tmp_with_ext)
-            with open(tmp_filename, 'wb') as handle:
-                r = requests.get(url, stream=True)
-
-                if not r.ok:
-                    return False
-
-                ONE_MEGABYTE = 1024 * 1024
-                for block in r.iter_content(ONE_MEGABYTE):
-                    if not block:
-                        break
-                    handle.write(block)
+            if self.offline:
+                raise Exception('{} is not cached and we are offline'.format(self.name))
+
+            # download file, resuming any earlier partial download. tarballs
+            #   are extracted while they download
+            dl_filename = self.cache.download_filename(url, suffix='.' + str(self._download_type))
+            stream = None
+            if is_tar(self._download_type):
+                stream_folder = self.cache.new_tree_folder()
+                stream = StreamingExtractor(stream_folder, self._download_type)
+
+            try:
+                self._fetch_release(url, dl_filename, stream)
+                digest = self.cache.add_blob(dl_filename, expected=self.sha256)
+                if self.sha256 is None:
+                    print('Downloaded {} {} without verifying it, its sha256 is {}'.format(
+                        self.name, self.release, digest))
+            except:
+                if stream is not None:
+                    stream.abort()
+                    shutil.rmtree(stream_folder, ignore_errors=True)
+                raise
 
             # extract into directory
-            if self._download_type == 'zip':
-                with ZipFile(tmp_filename, 'r') as source_zip:
-                    source_zip.extractall(self.source_folder, get_members(source_zip))
+            if stream is not None and stream.finish():
+                self.source_folder = self.cache.add_tree(digest, stream_folder,
+                                                         root=common_root(stream_folder))
             else:
-                raise Exception('Cannot extract/parse given download type')
-
-            # remove temp file
-            os.remove(tmp_filename)
+                if stream is not None:
+                    shutil.rmtree(stream_folder, ignore_errors=True)
+                self.source_folder = self.cache.extract(digest, self.extract_release)
+
+            sizes = {
+                self.cache.blob_path(digest): os.path.getsize(self.cache.blob_path(digest)),
+                self.source_folder: folder_size(self.source_folder),
+            }
+            self.cache.record(key, {
+                'sha256': digest,
+                'software': self.name,
+                'release': self.release,
+                'url': url,
+                'size': sum(sizes.values()),
+                'sizes': sizes,
+            })
+
+    def _update_mirror(self, mirror):
+        """Update our git mirror from the first backend that works."""
+        import git
+
+        for backend in self.backends:
+            fetch_url = backend.git_url(self)
+            if fetch_url is None:
+                continue
+
+            metrics = DownloadMetrics(fetch_url, source=backend.name)
+            self.download_metrics.append(metrics)
+
+            start = time.time()
+            try:
+                update_mirror(mirror, self.url, depth=self.git_depth, filter=self.git_filter,
+                              commit=self.git_commit, fetch_url=fetch_url)
+                metrics.ok = True
+                return
+            except git.GitCommandError:
+                if isinstance(backend, UpstreamBackend):
+                    raise
+                print('Could not fetch {} from {}, trying next source'.format(self.name,
+                                                                             backend.name))
+            finally:
+                metrics.elapsed = time.time() - start
+
+    def _fetch_release(self, url, filename, stream):
+        """Fetch our release archive from the first backend that has it."""
+        for backend in self.backends:
+            try:
+                if backend.fetch(self, url, filename, stream=stream):
+                    return
+            except DownloadError as ex:
+                if isinstance(backend, UpstreamBackend):
+                    raise
+                print('Could not fetch {} from {}, trying next source: {}'.format(
+                    self.name, backend.name, ex))
+
+        raise DownloadError('{} is not available from any source'.format(self.name))
+
+    def extract_release(self, filename, folder):
+        """Extract the given downloaded release into the given folder."""
+        extract(filename, folder, self._download_type)
+
+        # tarballs need their common directory prefix stripped after the fact
+        if is_tar(self._download_type):
+            return common_root(folder)
 
 
 class BaseSoftware(ReleaseDownloader):
     info = {}
     requires = {}
 
-    def init_info(self, config_folder=None):
-        """Initialise user/channel/etc info."""
+    # where our passwords etc come from, see seed_rng
+    rng = random
+    rng_seed = None
+
+    # glob patterns for source files not needed to build, left out of written
+    # sources. docs and tests are only listed where the build doesn't need them,
+    # eg maven just skips test sources that are missing
+    pack_exclude = []
+
+    def seed_rng(self, seed):
+        """Generate our random values from the given seed, or unseeded if it's None."""
+        self.rng_seed = seed
+        self.rng = random if seed is None else random.Random(seed)
+
+    def init_info(self):
+        """Declare user/channel/etc info, before any config is written.
+
+        Anything generated here, such as passwords, is kept in our info so
+        every config written afterwards sees the same values.
+        """
         ...
 
     def init_users(self, info):
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+
+import appdirs
+
+HASH_BLOCK_SIZE = 1024 * 1024
+DEFAULT_MAX_SIZE = 2 * 1024 * 1024 * 1024
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def base_directory():
+    """Return vagrirc's base cache directory."""
+    return appdirs.user_cache_dir('vagrirc', 'danieloaks')
+
+
+def release_cache():
+    """Return the shared ReleaseCache in vagrirc's cache directory."""
+    return get_cache(os.path.join(base_directory(), 'releases'))
+
+
+def get_cache(directory):
+    """Return the shared ReleaseCache for the given directory."""
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = ReleaseCache(directory)
+        return _caches[directory]
+
+
+def file_digest(filename):
+    """Return the SHA-256 hex digest of the given file."""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as handle:
+        for block in iter(lambda: handle.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def folder_size(folder):
+    """Return the total size of the files under the given folder."""
+    size = 0
+    stack = [folder]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                size += entry.stat(follow_symlinks=False).st_size
+    return size
+
+
+def make_key(software, release, url):
+    """Return the index key for the given software release."""
+    return ' '.join([software, str(release), url])
+
+
+class ReleaseCache:
+    """Content-addressed store of downloaded releases.
+
+    Archives are stored once under their SHA-256 digest in `blobs/`, and
+    extracted once into `trees/`. An index file maps (software, release, url)
+    to the digest, so deciding whether something is cached is a single index
+    lookup. Trees only appear once completely extracted, so a partial
+    extraction is never mistaken for a valid cache.
+
+    Each entry also records the size of each of its paths on disk and when
+    it was last used, so the cache can be reported on and trimmed back to a
+    size cap, least recently used first, without walking the whole cache.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.blobs_directory = os.path.join(directory, 'blobs')
+        self.trees_directory = os.path.join(directory, 'trees')
+        self.tmp_directory = os.path.join(directory, 'tmp')
+        self.index_filename = os.path.join(directory, 'index.json')
+
+        for folder in [self.blobs_directory, self.trees_directory, self.tmp_directory]:
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+
+        self._lock = threading.RLock()
+        self._index = None
+
+    # index
+    def _read_index(self):
+        try:
+            with open(self.index_filename, 'r') as index_file:
+                return json.loads(index_file.read())
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _write_index(self):
+        fd, tmp_filename = tempfile.mkstemp(dir=self.tmp_directory, suffix='.json')
+        with os.fdopen(fd, 'w') as index_file:
+            index_file.write(json.dumps(self._index, sort_keys=True, indent=4,
+                                        separators=(',', ': ')))
+        os.replace(tmp_filename, self.index_filename)
+
+    @property
+    def index(self):
+        with self._lock:
+            if self._index is None:
+                self._index = self._read_index()
+            return self._index
+
+    def lookup(self, key):
+        """Return the index entry for the given key, or None if not validly cached."""
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+
+        if 'sha256' in entry and not os.path.isdir(self.tree_path(entry['sha256'])):
+            return None
+
+        return entry
+
+    def record(self, key, entry):
+        """Record the given entry in the index, marking it as just used."""
+        entry = dict(entry)
+        entry['accessed'] = time.time()
+
+        with self._lock:
+            # merge with what's on disk, in case another process has written to it
+            self._index = self._read_index()
+            self._index[key] = entry
+            self._write_index()
+
+    def touch(self, key):
+        """Mark the given entry as just used."""
+        with self._lock:
+            entry = self.index.get(key)
+            if entry is not None:
+                self.record(key, entry)
+
+    def forget(self, key):
+        """Remove the given key from the index."""
+        with self._lock:
+            self._index = self._read_index()
+            if key in self._index:
+                del self._index[key]
+                self._write_index()
+
+    # blobs and trees
+    def blob_path(self, digest):
+        return os.path.join(self.blobs_directory, digest[:2], digest)
+
+    def tree_path(self, digest):
+        return os.path.join(self.trees_directory, digest)
+
+    def download_filename(self, url, suffix=''):
+        """Return a stable temporary filename to download the given url into.
+
+        This stays the same between runs, so interrupted downloads can resume.
+        """
+        url_digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.tmp_directory, 'download-' + url_digest + suffix)
+
+    def add_blob(self, filename, expected=None):
+        """Move the given file into the blob store, returning its digest.
+
+        If `expected` is given and does not match the file's digest, the file
+        is removed and an exception is raised.
+        """
+        digest = file_digest(filename)
+
+        if expected is not None and digest != expected.lower():
+            os.remove(filename)
+            raise Exception('Checksum mismatch: expected sha256 {}, got {}'.format(expected,
+                                                                                 digest))
+
+        blob_filename = self.blob_path(digest)
+        if os.path.exists(blob_filename):
+            os.remove(filename)
+        else:
+            os.makedirs(os.path.dirname(blob_filename), exist_ok=True)
+            os.replace(filename, blob_filename)
+
+        return digest
+
+    def new_tree_folder(self):
+        """Return a new, empty folder to extract a tree into, see add_tree."""
+        return tempfile.mkdtemp(dir=self.tmp_directory)
+
+    def add_tree(self, digest, folder, root=None):
+        """Move the given extracted folder into place as the tree for the given blob.
+
+        If `root` is given, it's the folder inside `folder` that becomes the
+        tree. Returns the tree path.
+        """
+        tree_folder = self.tree_path(digest)
+        try:
+            if not os.path.isdir(tree_folder):
+                os.rename(root or folder, tree_folder)
+        except OSError:
+            # somebody else finished extracting the same blob first
+            if not os.path.isdir(tree_folder):
+                raise
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+        return tree_folder
+
+    def extract(self, digest, extractor):
+        """Extract the given blob into its tree, returning the tree path.
+
+        `extractor` is called with the blob filename and a fresh directory to
+        extract into, and may return the folder inside that directory that
+        should become the tree. The tree is only moved into place once
+        extraction has finished.
+        """
+        tree_folder = self.tree_path(digest)
+        if os.path.isdir(tree_folder):
+            return tree_folder
+
+        tmp_folder = self.new_tree_folder()
+        try:
+            root = extractor(self.blob_path(digest), tmp_folder)
+        except:
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+            raise
+
+        return self.add_tree(digest, tmp_folder, root=root)
+
+    # size management
+    def entry_paths(self, entry):
+        """Return the paths on disk that belong to the given entry."""
+        if 'sha256' in entry:
+            return [self.blob_path(entry['sha256']), self.tree_path(entry['sha256'])]
+        return [path for path in [entry.get('mirror'), entry.get('worktree')] if path]
+
+    def path_sizes(self, entries):
+        """Return the size of each path on disk the given entries use.
+
+        Paths shared between entries, like an archive cached under two keys,
+        are only counted once. Entries from before we recorded `sizes` count
+        their `size` against all of their paths together.
+        """
+        sizes = {}
+        for entry in entries:
+            if 'sizes' in entry:
+                for path, size in entry['sizes'].items():
+                    sizes[path] = max(size, sizes.get(path, 0))
+            else:
+                paths = tuple(self.entry_paths(entry))
+                sizes[paths] = max(entry.get('size', 0), sizes.get(paths, 0))
+        return sizes
+
+    def total_size(self):
+        """Return the total size of everything in the index."""
+        return sum(self.path_sizes(self.index.values()).values())
+
+    def remove(self, key):
+        """Remove the given entry and any files no other entry uses."""
+        with self._lock:
+            self._index = self._read_index()
+            entry = self._index.pop(key, None)
+            if entry is None:
+                return
+
+            still_used = set()
+            for other in self._index.values():
+                still_used.update(self.entry_paths(other))
+
+            for path in self.entry_paths(entry):
+                if path in still_used:
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                elif os.path.exists(path):
+                    os.remove(path)
+
+            self._write_index()
+
+    def evict(self, max_size, keep=()):
+        """Remove least recently used entries until we're under max_size bytes.
+
+        Keys in `keep` are never removed. Returns the removed (key, entry) pairs.
+        """
+        removed = []
+
+        with self._lock:
+            self._index = self._read_index()
+            total = self.total_size()
+
+            by_age = sorted(self._index.items(), key=lambda item: item[1].get('accessed', 0))
+            for key, entry in by_age:
+                if total <= max_size:
+                    break
+                if key in keep:
+                    continue
+
+                # files other entries still use are kept, so may free nothing
+                self.remove(key)
+                total = self.total_size()
+                removed.append((key, entry))
+
+        return removed
+
+    def verify(self):
+        """Check every entry in the index, removing ones that are broken.
+
+        Returns a list of (key, problem) pairs for the removed entries.
+        """
+        problems = []
+
+        for key, entry in sorted(self.index.items()):
+            problem = None
+
+            if 'sha256' in entry:
+                blob_filename = self.blob_path(entry['sha256'])
+                if not os.path.isfile(blob_filename):
+                    problem = 'archive is missing'
+                elif file_digest(blob_filename) != entry['sha256']:
+                    problem = 'archive checksum does not match'
+                elif not os.path.isdir(self.tree_path(entry['sha256'])):
+                    problem = 'extracted source is missing'
+            else:
+                for path in self.entry_paths(entry):
+                    if not os.path.isdir(path):
+                        problem = '{} is missing'.format(path)
+                        break
+
+            if problem:
+                self.remove(key)
+                problems.append((key, problem))
+
+        return problems
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import json
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ONE_MEGABYTE = 1024 * 1024
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 2.0  # seconds, doubled after each failed attempt
+DEFAULT_TIMEOUT = 30  # seconds to wait for the server to send us something
+POOL_SIZE = 8  # connections kept open to each host
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the requests session shared by every download."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+class DownloadMetrics:
+    """How a single download went."""
+
+    def __init__(self, url, source=None):
+        self.url = url
+        self.source = source  # which backend / mirror we downloaded from
+        self.ok = False
+        self.bytes = 0  # received over the network, not counting resumed data
+        self.resumed_from = 0
+        self.retries = 0
+        self.time_to_first_byte = None
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self):
+        """Bytes per second while downloading."""
+        if not self.elapsed:
+            return None
+        return self.bytes / self.elapsed
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'source': self.source,
+            'ok': self.ok,
+            'bytes': self.bytes,
+            'resumed_from': self.resumed_from,
+            'retries': self.retries,
+            'time_to_first_byte': self.time_to_first_byte,
+            'elapsed': self.elapsed,
+            'throughput': self.throughput,
+        }
+
+
+class DownloadError(Exception):
+    """A file could not be downloaded."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status  # http status code, if we got one
+
+
+class _RetryableError(Exception):
+    ...
+
+
+def _read_sidecar(filename):
+    try:
+        with open(filename, 'r') as sidecar_file:
+            return json.loads(sidecar_file.read())
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def _write_sidecar(filename, info):
+    with open(filename, 'w') as sidecar_file:
+        sidecar_file.write(json.dumps(info, sort_keys=True))
+
+
+def _attempt(url, part_filename, sidecar_filename, timeout, stream, metrics):
+    """Make a single attempt at downloading, resuming from any partial file."""
+    sidecar = _read_sidecar(sidecar_filename)
+    if sidecar.get('url') != url or not os.path.exists(part_filename):
+        sidecar = {'url': url}
+        open(part_filename, 'wb').close()
+
+    received = os.path.getsize(part_filename)
+    if metrics.resumed_from == 0 and metrics.bytes == 0:
+        metrics.resumed_from = received
+
+    headers = {}
+    if received:
+        # a stream can only be fed from the very start of the file
+        if stream is not None:
+            stream.abort()
+
+        headers['Range'] = 'bytes={}-'.format(received)
+        # make sure we only get a partial response for the same file
+        validator = sidecar.get('etag') or sidecar.get('last_modified')
+        if validator:
+            headers['If-Range'] = validator
+
+    start = time.time()
+    try:
+        r = get_session().get(url, stream=True, headers=headers, timeout=timeout)
+    except (requests.ConnectionError, requests.Timeout) as ex:
+        raise _RetryableError(str(ex))
+
+    with r:
+        if r.status_code == 416 and received and received == sidecar.get('size'):
+            # we already have all of it
+            return
+        elif r.status_code == 206:
+            mode = 'ab'
+        elif r.status_code == 200:
+            # server ignored our range, or the file changed; start over
+            mode = 'wb'
+            received = 0
+            metrics.resumed_from = 0
+        elif r.status_code == 416 or r.status_code >= 500:
+            if r.status_code == 416:
+                # our partial file doesn't make sense to the server
+                os.remove(part_filename)
+                metrics.resumed_from = 0
+            raise _RetryableError('HTTP {} {}'.format(r.status_code, r.reason))
+        else:
+            raise DownloadError('Could not download {}: HTTP {} {}'.format(url, r.status_code,
+                                                                            r.reason),
+                                status=r.status_code)
+
+        # remember how to resume this download
+        if mode == 'wb':
+            sidecar['etag'] = r.headers.get('ETag')
+            sidecar['last_modified'] = r.headers.get('Last-Modified')
+        length = r.headers.get('Content-Length')
+        if length is not None:
+            sidecar['size'] = received + int(length)
+        _write_sidecar(sidecar_filename, sidecar)
+
+        try:
+            with open(part_filename, mode) as handle:
+                for block in r.iter_content(ONE_MEGABYTE):
+                    if not block:
+                        break
+                    if metrics.time_to_first_byte is None:
+                        metrics.time_to_first_byte = time.time() - start
+                    metrics.bytes += len(block)
+                    handle.write(block)
+                    if stream is not None:
+                        stream.feed(block)
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError) as ex:
+            raise _RetryableError(str(ex))
+
+    size = sidecar.get('size')
+    if size is not None and os.path.getsize(part_filename) < size:
+        raise _RetryableError('connection closed after {} of {} bytes'.format(
+            os.path.getsize(part_filename), size))
+
+
+def download_file(url, filename, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                  timeout=DEFAULT_TIMEOUT, stream=None, metrics=None):
+    """Download the given url to the given filename.
+
+    Data is written to `<filename>.part`, with progress tracked in
+    `<filename>.part.json`, so an interrupted download picks up where it left
+    off using an HTTP Range request. Failed attempts are retried with
+    exponential backoff, and DownloadError is raised once we run out.
+
+    If given, `stream` has each block passed to its `feed` method as it
+    arrives. If the download can't be streamed from start to end in one go,
+    its `abort` method is called instead.
+
+    Returns a DownloadMetrics describing the download, filling in `metrics`
+    if one is given.
+    """
+    part_filename = filename + '.part'
+    sidecar_filename = part_filename + '.json'
+    if metrics is None:
+        metrics = DownloadMetrics(url)
+    start = time.time()
+
+    attempt = 0
+    try:
+        while True:
+            try:
+                _attempt(url, part_filename, sidecar_filename, timeout, stream, metrics)
+                break
+            except _RetryableError as ex:
+                if stream is not None:
+                    stream.abort()
+
+                if attempt >= retries:
+                    raise DownloadError('Could not download {} after {} attempts: {}'.format(
+                        url, attempt + 1, ex))
+
+                delay = backoff * (2 ** attempt)
+                attempt += 1
+                metrics.retries = attempt
+                print('Download of {} failed ({}), retrying in {:.1f}s [{}/{}]'.format(
+                    url, ex, delay, attempt, retries))
+                time.sleep(delay)
+    finally:
+        metrics.elapsed = time.time() - start
+
+    os.replace(part_filename, filename)
+    if os.path.exists(sidecar_filename):
+        os.remove(sidecar_filename)
+
+    metrics.ok = True
+    return metrics
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import json
+import time
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .utils import human_size
+
+DEFAULT_JOBS = 4
+
+
+class FetchResult:
+    """Outcome of fetching a single piece of software."""
+
+    def __init__(self, name, ok, error=None, elapsed=0.0):
+        self.name = name
+        self.ok = ok
+        self.error = error
+        self.elapsed = elapsed
+        self.metrics = []  # DownloadMetrics for each download we made
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'ok': self.ok,
+            'error': self.error,
+            'elapsed': self.elapsed,
+            'downloads': [metrics.to_dict() for metrics in self.metrics],
+        }
+
+
+def _fetch_one(downloader):
+    """Download the given software, returning a FetchResult."""
+    downloader.download_metrics = []
+    start = time.time()
+    trace = None
+    try:
+        ret = downloader.download_release()
+    except Exception as ex:
+        error = '{}: {}'.format(type(ex).__name__, ex)
+        result = FetchResult(downloader.name, False, error=error, elapsed=time.time() - start)
+        trace = traceback.format_exc()
+    else:
+        if ret is False:
+            result = FetchResult(downloader.name, False, error='download failed',
+                                 elapsed=time.time() - start)
+        else:
+            result = FetchResult(downloader.name, True, elapsed=time.time() - start)
+
+    result.metrics = downloader.download_metrics
+    return result, trace
+
+
+def fetch_all(downloaders, jobs=DEFAULT_JOBS):
+    """Fetch the given downloaders concurrently, returning a list of FetchResults.
+
+    At most `jobs` downloads run at once. A failure in one download is
+    recorded and reported, and does not stop the others.
+    """
+    # software shared between several nodes is only fetched once
+    unique = []
+    duplicates = {}
+    for downloader in downloaders:
+        if downloader.source_folder in duplicates:
+            duplicates[downloader.source_folder].append(downloader)
+            continue
+        duplicates[downloader.source_folder] = []
+        unique.append((downloader, duplicates[downloader.source_folder]))
+
+    if not unique:
+        return []
+
+    jobs = max(1, min(int(jobs), len(unique)))
+    total = len(unique)
+    print_lock = threading.Lock()
+    results = []
+
+    print('Fetching {} package{} ({} at a time)'.format(total, '' if total == 1 else 's',
+                                                         jobs))
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(_fetch_one, d): d for d, skipped in unique}
+
+        for future in as_completed(futures):
+            result, trace = future.result()
+            results.append(result)
+
+            with print_lock:
+                if result.ok:
+                    print('  [{}/{}] {}: done ({:.1f}s)'.format(len(results), total,
+                                                               result.name, result.elapsed))
+                else:
+                    print('  [{}/{}] {}: FAILED ({:.1f}s) - {}'.format(len(results), total,
+                                                                      result.name,
+                                                                      result.elapsed,
+                                                                      result.error))
+                    if trace:
+                        print(trace)
+
+    # downloading can move the source folder into the cache, so the nodes we
+    #   skipped take theirs from the one we fetched
+    for downloader, skipped in unique:
+        for duplicate in skipped:
+            duplicate.source_folder = downloader.source_folder
+            duplicate.download_metrics = downloader.download_metrics
+
+    return results
+
+
+def report_metrics(results):
+    """Print a summary of the downloads made while fetching."""
+    lines = []
+    for result in sorted(results, key=lambda r: r.name):
+        for metrics in result.metrics:
+            line = '  {} from {}: '.format(result.name, metrics.source)
+            if metrics.bytes:
+                line += '{} in {:.1f}s'.format(human_size(metrics.bytes), metrics.elapsed)
+                if metrics.throughput:
+                    line += ' ({}/s)'.format(human_size(metrics.throughput))
+            else:
+                line += '{:.1f}s'.format(metrics.elapsed)
+            if metrics.time_to_first_byte is not None:
+                line += ', first byte after {:.2f}s'.format(metrics.time_to_first_byte)
+            if metrics.resumed_from:
+                line += ', resumed from {}'.format(human_size(metrics.resumed_from))
+            if metrics.retries:
+                line += ', {} retr{}'.format(metrics.retries,
+                                            'y' if metrics.retries == 1 else 'ies')
+            if not metrics.ok:
+                line += ' [FAILED]'
+            lines.append(line)
+
+    if lines:
+        print('Downloads:')
+        for line in lines:
+            print(line)
+
+
+def write_metrics(results, filename):
+    """Write the metrics of the given fetch results to the given JSON file."""
+    with open(filename, 'w') as metrics_file:
+        metrics_file.write(json.dumps([result.to_dict() for result in results],
+                                      sort_keys=True, indent=4, separators=(',', ': ')))
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+"""Parser and serializer for ircd-hybrid style config files.
+
+These look like:
+
+    serverinfo {
+        name = "hades.arpa";
+        hub = no;
+    };
+
+Blocks hold `key = value;` entries and other blocks. Everything keeps the
+text it was parsed from, so serializing a config that hasn't been edited
+gives back exactly what was parsed. Comments should be stripped first, see
+lexer.ConfigLexer.
+"""
+
+import re
+from collections import defaultdict
+
+_SPACE = re.compile(r'\s*')
+_WORD = re.compile(r'[^\s{}=;"]+')
+_LABEL = re.compile(r'"(?:[^"\\]|\\.)*"')
+_VALUE = re.compile(r'(?:"(?:[^"\\]|\\.)*"|[^";{}])*')
+_CLOSE = re.compile(r'\}(?:\s*;)?')
+_JUNK = re.compile(r'[^;\n{}]*;?')
+
+
+def quote(value):
+    """Return the given string as a quoted config value."""
+    return '"{}"'.format(str(value).replace('\\', '\\\\').replace('"', '\\"'))
+
+
+class Item:
+    """Something in a config file, along with the blank space before it."""
+
+    def __init__(self, leading='\n'):
+        self.leading = leading
+        self.removed = False
+        self.after = []  # items inserted after this one
+
+    @property
+    def active(self):
+        """Whether this item is in effect."""
+        return not self.removed
+
+    def render(self):
+        ...
+
+    def serialize(self, out):
+        if not self.removed:
+            out.append(self.leading)
+            out.append(self.render())
+        for item in self.after:
+            item.serialize(out)
+
+
+class Text(Item):
+    """Text we don't understand, kept as it is."""
+
+    def __init__(self, text, leading=''):
+        super().__init__(leading)
+        self.text = text
+
+    def render(self):
+        return self.text
+
+
+class Entry(Item):
+    """A `key = value;` entry."""
+
+    def __init__(self, key, value, raw=None, leading='\n    '):
+        super().__init__(leading)
+        self.key = key
+        self._value = value
+        self.raw = raw if raw is not None else self._format()
+
+    def _format(self):
+        return '{} = {};'.format(self.key, self._value)
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        self.raw = self._format()
+
+    def render(self):
+        return self.raw
+
+
+class _Container:
+    """Something that holds entries and blocks, indexed by key and type."""
+
+    def _init_items(self, items):
+        self.items = []
+        self._entries = defaultdict(list)
+        self._blocks = defaultdict(list)
+        for item in items:
+            self.items.append(self._add(item))
+
+    def _add(self, item):
+        if isinstance(item, Entry):
+            self._entries[item.key].append(item)
+        elif isinstance(item, Block):
+            self._blocks[item.type].append(item)
+        return item
+
+    def append(self, item):
+        """Add the given item to the end."""
+        self.items.append(self._add(item))
+        return item
+
+    def insert_after(self, existing, item):
+        """Add the given item right after the existing one."""
+        existing.after.append(self._add(item))
+        return item
+
+    def _all_items(self):
+        """Yield our items in order, including ones inserted after others."""
+        stack = list(reversed(self.items))
+        while stack:
+            item = stack.pop()
+            yield item
+            stack.extend(reversed(item.after))
+
+    def blocks(self, block_type=None):
+        """Return the blocks of the given type, or all blocks."""
+        if block_type is None:
+            return [item for item in self._all_items()
+                    if isinstance(item, Block) and item.active]
+        return [block for block in self._blocks.get(block_type, []) if block.active]
+
+    def block(self, block_type):
+        """Return the first block of the given type, or None."""
+        for block in self._blocks.get(block_type, []):
+            if block.active:
+                return block
+
+    def entries(self, key=None):
+        """Return the entries with the given key, or all entries."""
+        if key is None:
+            return [item for item in self._all_items()
+                    if isinstance(item, Entry) and item.active]
+        return [entry for entry in self._entries.get(key, []) if entry.active]
+
+    def get(self, key, default=None):
+        """Return the value of the first entry with the given key."""
+        for entry in self._entries.get(key, []):
+            if entry.active:
+                return entry.value
+        return default
+
+    def set(self, key, value):
+        """Set the value of the first entry with the given key, adding it if needed."""
+        for entry in self._entries.get(key, []):
+            if entry.active:
+                entry.value = value
+                return entry
+        return self.append(Entry(key, value))
+
+    def walk(self):
+        """Yield every block under this one, at any depth."""
+        for block in self.blocks():
+            yield block
+            yield from block.walk()
+
+    def _serialize_items(self, out):
+        for item in self.items:
+            item.serialize(out)
+
+
+class Block(_Container, Item):
+    """A `type { ... };` block."""
+
+    def __init__(self, block_type, items=(), label=None, header=None, closing='\n};',
+                 leading='\n'):
+        Item.__init__(self, leading)
+        self.type = block_type
+        self.label = label
+        if header is None:
+            header = '{} {{'.format(block_type) if label is None else \
+                '{} {} {{'.format(block_type, label)
+        self.header = header
+        self.closing = closing
+        self._init_items(items)
+
+    def render(self):
+        out = [self.header]
+        self._serialize_items(out)
+        out.append(self.closing)
+        return ''.join(out)
+
+    @property
+    def text(self):
+        """The text inside this block."""
+        out = []
+        self._serialize_items(out)
+        return ''.join(out)
+
+
+class Config(_Container):
+    """A whole config file."""
+
+    def __init__(self, items=(), trailing='\n'):
+        self._init_items(items)
+        self.trailing = trailing
+
+    def __str__(self):
+        out = []
+        self._serialize_items(out)
+        out.append(self.trailing)
+        return ''.join(out)
+
+    def replace_in_values(self, old, new):
+        """Replace the given text in the values of every entry."""
+        for block in self.walk():
+            for entry in block.entries():
+                if old in entry.value:
+                    entry.value = entry.value.replace(old, new)
+
+    def replace_entries(self, key, old, new):
+        """Set entries with the given key and value to the new value, in every block."""
+        for block in self.walk():
+            for entry in block.entries(key):
+                if entry.value == old:
+                    entry.value = new
+
+
+def _parse_items(text, i, top):
+    items = []
+    length = len(text)
+
+    while True:
+        start = _SPACE.match(text, i).end()
+        leading = text[i:start]
+
+        if start == length:
+            if not top:
+                raise Exception('Config block was never closed')
+            return items, leading, start
+
+        if text[start] == '}' and not top:
+            end = _CLOSE.match(text, start).end()
+            return items, text[i:end], end
+
+        word = _WORD.match(text, start)
+        if word:
+            pos = _SPACE.match(text, word.end()).end()
+            label = _LABEL.match(text, pos)
+            if label:
+                pos = _SPACE.match(text, label.end()).end()
+
+            # block
+            if text.startswith('{', pos):
+                block_items, closing, i = _parse_items(text, pos + 1, False)
+                items.append(Block(word.group(), block_items,
+                                   label=label.group() if label else None,
+                                   header=text[start:pos + 1], closing=closing,
+                                   leading=leading))
+                continue
+
+            # entry
+            if label is None and text.startswith('=', pos):
+                value = _VALUE.match(text, pos + 1)
+                if text.startswith(';', value.end()):
+                    i = value.end() + 1
+                    items.append(Entry(word.group(), value.group().strip(),
+                                       raw=text[start:i], leading=leading))
+                    continue
+
+        # something we don't understand, keep it as it is
+        end = _JUNK.match(text, start).end()
+        if end == start:
+            end += 1
+        items.append(Text(text[start:end], leading=leading))
+        i = end
+
+
+def parse(text):
+    """Parse the given config file text into a Config."""
+    items, trailing, i = _parse_items(text, 0, True)
+    return Config(items, trailing=trailing)
+
+
+def parse_block(text, leading='\n'):
+    """Parse the given text of a single block into a Block."""
+    config = parse(text)
+    blocks = config.blocks()
+    if len(blocks) != 1:
+        raise Exception('Expected a single config block, found {}'.format(len(blocks)))
+    blocks[0].leading = leading
+    return blocks[0]
+
+
+class ConfigEdits:
+    """A rule for templates.apply_rules that edits the config structurally.
+
+    - `remove_blocks`: types of top-level blocks to remove.
+    - `remove_blocks_containing`: (type, text) pairs, top-level blocks of the
+      given type containing the given text are removed.
+    - `remove_entries`: (key, value) pairs, entries with the given key are
+      removed from every block. If value is None, whatever their value.
+    - `replace_entries`: (key, old value, new value) for every block.
+    - `replace_in_values`: (old, new) text to replace in every entry value.
+    """
+    version = 1
+
+    def __init__(self, remove_blocks=(), remove_blocks_containing=(), remove_entries=(),
+                 replace_entries=(), replace_in_values=()):
+        self.remove_blocks = list(remove_blocks)
+        self.remove_blocks_containing = list(remove_blocks_containing)
+        self.remove_entries = list(remove_entries)
+        self.replace_entries = list(replace_entries)
+        self.replace_in_values = list(replace_in_values)
+
+    def apply(self, config):
+        for block_type in self.remove_blocks:
+            for block in config.blocks(block_type):
+                block.removed = True
+
+        for block_type, text in self.remove_blocks_containing:
+            for block in config.blocks(block_type):
+                if text in block.text:
+                    block.removed = True
+
+        for block in config.walk():
+            for key, value in self.remove_entries:
+                for entry in block.entries(key):
+                    if value is None or entry.value == value:
+                        entry.removed = True
+
+        for key, old, new in self.replace_entries:
+            config.replace_entries(key, old, new)
+
+        for old, new in self.replace_in_values:
+            config.replace_in_values(old, new)
+
+    def __call__(self, text):
+        config = parse(text)
+        self.apply(config)
+        return str(config)
+
+    def describe(self):
+        return ['ircdconf', self.version, self.remove_blocks, self.remove_blocks_containing,
+                self.remove_entries, self.replace_entries, self.replace_in_values]
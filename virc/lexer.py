@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import re
+
+_C_COMMENT = r'/\*'
+_LINE_SPACE = r'[^\S\n]*'
+
+
+def _line_markers(cpp_comments, shell_comments):
+    markers = []
+    if cpp_comments:
+        markers.append('//')
+    if shell_comments:
+        markers.append('#')
+    return '|'.join(re.escape(marker) for marker in markers)
+
+
+def strip_config(text, c_comments=True, cpp_comments=False, shell_comments=False,
+                 spaced_c_comments=False, collapse=True):
+    """Strip comments and blank space from the given config file text.
+
+    This makes a single pass over the text, so it takes linear time however
+    the comments are laid out.
+
+    - `c_comments`: remove /* */ comments. A /* that is never closed isn't
+      treated as a comment.
+    - `cpp_comments`, `shell_comments`: remove // or # comments that make up
+      the whole of a line, apart from blank space.
+    - `spaced_c_comments`: only treat /* as a comment when it comes at the
+      start of the text or after a space or newline, which is removed too.
+    - `collapse`: remove blank lines and blank space at the start and end,
+      and make sure the text ends with a newline.
+
+    Comments are found from left to right like in C, so a /* inside a // or
+    # comment does not start a comment.
+
+    This differs from the regexes it replaced in two cases, on purpose. The
+    regexes only removed // and # comments after a newline, so they missed
+    one on the first line. They also removed from a /* inside a line comment
+    up to the next */, taking the lines in between with it.
+    """
+    markers = _line_markers(cpp_comments, shell_comments)
+    patterns = []
+    if c_comments:
+        patterns.append(_C_COMMENT)
+    if markers:
+        patterns.append('^{}(?:{})'.format(_LINE_SPACE, markers))
+        # line comments that only start after a c comment on the same line
+        line_comment = re.compile('{}(?:{})'.format(_LINE_SPACE, markers))
+    special = re.compile('|'.join(patterns), re.MULTILINE) if patterns else None
+    last_close = text.rfind('*/')
+
+    pieces = []
+    line_blank = True  # whether the current line is blank so far
+    prev_blank = True  # whether the line before it was
+
+    i = 0
+    length = len(text)
+    while i < length:
+        match = special.search(text, i) if special else None
+        if match is None:
+            end = length
+        else:
+            end = match.start()
+
+        piece = text[i:end]
+        if piece:
+            pieces.append(piece)
+            if '\n' in piece:
+                head, newline, tail = piece.rpartition('\n')
+                if '\n' in head:
+                    prev_blank = not head.rpartition('\n')[2].strip()
+                else:
+                    prev_blank = line_blank and not head.strip()
+                line_blank = not tail.strip()
+            else:
+                line_blank = line_blank and not piece.strip()
+
+        if match is None:
+            break
+        i = match.end()
+
+        if not match.group().endswith('/*'):
+            # line comment, leave the newline at the end of it
+            end = text.find('\n', i)
+            i = length if end == -1 else end
+            continue
+
+        start = match.start()
+        if start + 2 > last_close:
+            # never closed, so nothing from here on can be a c comment
+            pieces.append('/*')
+            line_blank = False
+            special = re.compile(patterns[1], re.MULTILINE) if markers else None
+            continue
+
+        if spaced_c_comments and start > 0:
+            if not text[start - 1].isspace():
+                pieces.append('/*')
+                line_blank = False
+                continue
+
+            # the space before the comment goes too
+            if pieces[-1].endswith('\n'):
+                line_blank = prev_blank
+            pieces[-1] = pieces[-1][:-1]
+
+        i = text.find('*/', start + 2) + 2
+
+        if markers and line_blank:
+            match = line_comment.match(text, i)
+            if match:
+                end = text.find('\n', match.end())
+                i = length if end == -1 else end
+
+    text = ''.join(pieces)
+    if not collapse:
+        return text
+
+    return '\n'.join(line for line in text.split('\n') if line.strip()).strip() + '\n'
+
+
+class ConfigLexer:
+    """A rule for templates.apply_rules that runs strip_config with the given options."""
+    version = 1
+
+    def __init__(self, **options):
+        self.options = options
+
+    def __call__(self, text):
+        return strip_config(text, **self.options)
+
+    def describe(self):
+        return ['lexer', self.version, sorted(self.options.items())]
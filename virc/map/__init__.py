@@ -33,11 +33,12 @@ class MapBaseServer:
         self.network.add_node(self)
 
     def link_to(self, server, info=None):
-        """Link to the given server."""
-        self.network.add_edge(self, server)
-        if info:
-            link = (self, server)
-            nx.set_edge_attributes(self.network, link, info)
+        """Link to the given server.
+
+        `info` is a dict (or list of pairs) of link attributes, stored as the
+        edge's data.
+        """
+        self.network.add_edge(self, server, **dict(info or {}))
 
     @property
     def folder_slug(self):
@@ -77,6 +78,33 @@ class MapServiceBot(MapBaseServer):
     hidden = True
 
 
+def link_index(network):
+    """Return a dict of each server to a list of info dicts, one per link.
+
+    Each dict holds the link's attributes plus `remote_name`, and for
+    servers other than client servers, the `server_software` of the client
+    server on the other end. This reads each server's adjacency once, so it
+    takes time linear in the size of the network.
+    """
+    index = {}
+
+    for server in network.nodes():
+        links = []
+
+        for remote, attributes in network.adj[server].items():
+            info = dict(attributes)
+            info['remote_name'] = remote.info['name']
+
+            if not server.client and remote.client:
+                info['server_software'] = remote.software
+
+            links.append(info)
+
+        index[server] = links
+
+    return index
+
+
 def network_stats(network):
     """Counts the types of servers in the given network."""
     stats = {
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import stat
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .pack import excluded
+
+# linux ioctl to make a copy-on-write clone of a file (btrfs, xfs, etc)
+FICLONE = 0x40049409
+
+# ways we can materialize files, in order of preference for each mode
+MODES = {
+    'copy': ['copy'],
+    'reflink': ['reflink', 'copy'],
+    'hardlink': ['reflink', 'hardlink', 'copy'],
+}
+DEFAULT_MODE = 'reflink'
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        raise OSError('reflinks are not supported on this platform')
+
+    try:
+        with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+    except:
+        if os.path.exists(dst):
+            os.remove(dst)
+        raise
+    shutil.copystat(src, dst)
+
+
+def _hardlink(src, dst):
+    os.link(src, dst)
+
+
+def _copy(src, dst):
+    # copy2 keeps mtime, so the file is seen as unchanged next time
+    shutil.copy2(src, dst)
+
+
+_methods = {
+    'reflink': _reflink,
+    'hardlink': _hardlink,
+    'copy': _copy,
+}
+
+
+def _unchanged(src_stat, dst_stat):
+    if (src_stat.st_dev, src_stat.st_ino) == (dst_stat.st_dev, dst_stat.st_ino):
+        return True
+    return (src_stat.st_size == dst_stat.st_size and
+            int(src_stat.st_mtime) == int(dst_stat.st_mtime))
+
+
+def _remove(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+class Materializer:
+    """Makes folders into mirrors of other folders, as cheaply as it can.
+
+    Files are reflinked or hardlinked from the source where the filesystem
+    allows it, and copied otherwise. Files whose size and mtime already
+    match are left alone, and files that aren't in the source are removed.
+
+    Hardlinked files share their contents with the source, so anything that
+    edits them in place also edits the source. Only use 'hardlink' if nothing
+    writes into the materialized folder's existing files.
+    """
+
+    def __init__(self, mode=DEFAULT_MODE):
+        if mode not in MODES:
+            raise Exception('Unknown materialize mode: {}'.format(mode))
+        self.methods = list(MODES[mode])
+        self.stats = {
+            'unchanged': 0,
+            'removed': 0,
+        }
+
+    def place(self, src, dst):
+        """Place the file src at dst, which must not exist."""
+        while True:
+            method = self.methods[0]
+            try:
+                _methods[method](src, dst)
+            except OSError:
+                if len(self.methods) == 1:
+                    raise
+                # eg different filesystems, don't bother trying this again
+                self.methods.pop(0)
+                continue
+
+            self.stats[method] = self.stats.get(method, 0) + 1
+            return
+
+    def materialize(self, src_folder, dst_folder, exclude=(), _rel_folder=''):
+        """Make dst_folder match src_folder.
+
+        Entries matching any of the `exclude` glob patterns, by name or by path
+        relative to src_folder, are treated as if they weren't in the source.
+        """
+        if not os.path.isdir(dst_folder):
+            if os.path.lexists(dst_folder):
+                os.remove(dst_folder)
+            os.makedirs(dst_folder)
+
+        src_entries = {}
+        for entry in os.scandir(src_folder):
+            relpath = os.path.join(_rel_folder, entry.name) if _rel_folder else entry.name
+            if not excluded(relpath, entry.name, exclude):
+                src_entries[entry.name] = entry
+
+        # remove what's no longer there
+        for entry in os.scandir(dst_folder):
+            if entry.name not in src_entries:
+                _remove(entry.path)
+                self.stats['removed'] += 1
+
+        for name, entry in src_entries.items():
+            dst = os.path.join(dst_folder, name)
+
+            if entry.is_symlink():
+                target = os.readlink(entry.path)
+                if os.path.islink(dst) and os.readlink(dst) == target:
+                    self.stats['unchanged'] += 1
+                    continue
+                if os.path.lexists(dst):
+                    _remove(dst)
+                os.symlink(target, dst)
+
+            elif entry.is_dir():
+                if os.path.islink(dst) or (os.path.lexists(dst) and not os.path.isdir(dst)):
+                    _remove(dst)
+                self.materialize(entry.path, dst, exclude,
+                                 os.path.join(_rel_folder, name) if _rel_folder else name)
+
+            else:
+                src_stat = entry.stat()
+                try:
+                    dst_stat = os.lstat(dst)
+                except FileNotFoundError:
+                    dst_stat = None
+
+                if dst_stat is not None:
+                    if stat.S_ISREG(dst_stat.st_mode) and _unchanged(src_stat, dst_stat):
+                        self.stats['unchanged'] += 1
+                        continue
+                    _remove(dst)
+
+                self.place(entry.path, dst)
+
+
+def materialize(src_folder, dst_folder, mode=DEFAULT_MODE, exclude=()):
+    """Make dst_folder match src_folder, returning stats on what was done."""
+    materializer = Materializer(mode)
+    materializer.materialize(src_folder, dst_folder, exclude)
+    return materializer.stats
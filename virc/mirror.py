@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import shutil
+import hashlib
+import threading
+
+SUBMODULE_JOBS = 4
+
+# the remote's default branch gets fetched into this ref
+UPSTREAM_HEAD = 'refs/upstream/HEAD'
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _lock_for(folder):
+    with _locks_lock:
+        if folder not in _locks:
+            _locks[folder] = threading.Lock()
+        return _locks[folder]
+
+
+def mirror_folder(base_directory, url):
+    """Return the folder holding the shared bare mirror of the given url."""
+    url_digest = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(base_directory, 'mirrors', url_digest + '.git')
+
+
+def has_commit(folder, commit):
+    """Return True if the given mirror already contains the given commit."""
+    import git
+
+    if not os.path.exists(folder):
+        return False
+
+    try:
+        git.Repo(folder).git.cat_file('-e', '{}^{{commit}}'.format(commit))
+    except git.GitCommandError:
+        return False
+    return True
+
+
+def worktree_commit(folder):
+    """Return the hexsha checked out in the given worktree, or None."""
+    import git
+
+    if not os.path.isfile(os.path.join(folder, '.git')):
+        return None
+
+    try:
+        return git.Repo(folder).head.commit.hexsha
+    except (git.GitError, ValueError):
+        return None
+
+
+def update_mirror(folder, url, depth=None, filter=None, commit=None, fetch_url=None):
+    """Create or update a bare mirror of the given url in the given folder.
+
+    `depth` makes a shallow fetch and `filter` a partial one (for instance
+    'blob:none'), where missing objects are fetched when checked out. If
+    `commit` is given and isn't on any branch we fetched, it's fetched by id.
+    If `fetch_url` is given, objects are fetched from there instead of `url`.
+    """
+    import git
+
+    if fetch_url is None or fetch_url == url:
+        remote = 'origin'
+    else:
+        remote = fetch_url
+        # partial fetches only work from the remote we originally cloned from
+        filter = None
+
+    with _lock_for(folder):
+        if os.path.exists(folder):
+            repo = git.Repo(folder)
+        else:
+            repo = git.Repo.init(folder, bare=True, mkdir=True)
+            with repo.config_writer() as config:
+                config.set_value('remote "origin"', 'url', url)
+                config.set_value('remote "origin"', 'fetch', '+refs/heads/*:refs/heads/*')
+
+        if filter:
+            with repo.config_writer() as config:
+                config.set_value('remote "origin"', 'promisor', 'true')
+                config.set_value('remote "origin"', 'partialclonefilter', filter)
+
+        repo.git.fetch(remote, '+refs/heads/*:refs/heads/*', '+HEAD:' + UPSTREAM_HEAD,
+                       prune=True, force=True, depth=depth, filter=filter)
+
+    if commit and not has_commit(folder, commit):
+        with _lock_for(folder):
+            repo.git.fetch(remote, '+{0}:refs/pinned/{0}'.format(commit),
+                           depth=depth, filter=filter)
+
+    return repo
+
+
+def _is_worktree_of(folder, mirror):
+    """Return True if the given folder is a worktree of the given mirror."""
+    dot_git = os.path.join(folder, '.git')
+    if not os.path.isfile(dot_git):
+        return False
+
+    with open(dot_git, 'r') as dot_git_file:
+        gitdir = dot_git_file.read().strip()
+    if not gitdir.startswith('gitdir:'):
+        return False
+    gitdir = os.path.abspath(gitdir.split(':', 1)[1].strip())
+
+    return (gitdir.startswith(os.path.abspath(mirror) + os.sep) and
+            os.path.exists(gitdir))
+
+
+def checkout_worktree(mirror, folder, ref=UPSTREAM_HEAD, submodule_jobs=SUBMODULE_JOBS):
+    """Check out the given ref of the mirror into the given worktree folder.
+
+    Returns the hexsha of the commit that was checked out.
+    """
+    import git
+
+    # fail clearly rather than with whatever worktree add makes of it
+    if not has_commit(mirror, ref):
+        raise Exception('{} is not in the mirror {}'.format(ref, mirror))
+
+    with _lock_for(mirror):
+        if not _is_worktree_of(folder, mirror):
+            # plain clones from older versions of vagrirc get replaced
+            if os.path.exists(folder):
+                shutil.rmtree(folder)
+            mirror_repo = git.Repo(mirror)
+            mirror_repo.git.worktree('prune')
+            mirror_repo.git.worktree('add', '--detach', '--force', folder, ref)
+
+    repo = git.Repo(folder)
+    repo.git.checkout(ref, detach=True, force=True)
+    repo.git.submodule('update', '--init', '--recursive', '--jobs={}'.format(submodule_jobs))
+
+    return repo.head.commit.hexsha
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import json
+import stat
+import shutil
+import tempfile
+
+from .cache import file_digest
+from .materialize import Materializer
+
+MANIFEST_FILENAME = 'output_manifest.json'
+GENERATIONS_FOLDER = 'generations'
+
+# output folders in the irc folder that live in generations
+OUTPUT_NAMES = ['configs', 'build', 'launch', 'init']
+
+
+def _walk_files(folder):
+    """Yield the relative paths of all files under the given folder."""
+    for dirpath, dirnames, filenames in os.walk(folder):
+        for filename in filenames:
+            yield os.path.relpath(os.path.join(dirpath, filename), folder)
+
+
+def _key(name, relpath):
+    return '/'.join([name] + relpath.split(os.sep))
+
+
+def symlinks_supported(folder):
+    """Return whether symlinks can be made in the given folder.
+
+    They can't on Windows without the symlink privilege, or on some shared
+    folders such as VirtualBox's.
+    """
+    probe = os.path.join(folder, '.symlink-probe')
+    try:
+        if os.path.lexists(probe):
+            os.remove(probe)
+        os.symlink('.', probe)
+    except (OSError, NotImplementedError, AttributeError):
+        return False
+    os.remove(probe)
+    return True
+
+
+def _swap_link(link, target):
+    """Atomically point the given symlink at the given target."""
+    tmp_link = link + '.tmp'
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(target, tmp_link)
+    os.replace(tmp_link, link)
+
+
+class OutputManifest:
+    """Content hashes of every file in a generation of outputs.
+
+    Files rendered into a new generation whose contents match the previous
+    generation are swapped for links to the previous generation's file, so
+    they keep their mtime and aren't seen as changed by the guest.
+    """
+
+    def __init__(self, folder=None):
+        self.old_folder = folder
+        self.old_files = {}
+        self.files = {}
+
+        if folder is not None:
+            try:
+                with open(os.path.join(folder, MANIFEST_FILENAME), 'r') as manifest_file:
+                    self.old_files = json.loads(manifest_file.read()).get('files', {})
+            except (IOError, OSError, ValueError):
+                pass
+
+        self._materializer = Materializer('hardlink')
+
+    def sync(self, rendered_folder, name):
+        """Record the newly rendered output folder `name`."""
+        for relpath in sorted(_walk_files(rendered_folder)):
+            key = _key(name, relpath)
+            path = os.path.join(rendered_folder, relpath)
+
+            digest = file_digest(path)
+            self.files[key] = digest
+
+            if self.old_folder is None or self.old_files.get(key) != digest:
+                continue
+
+            old_path = os.path.join(self.old_folder, name, relpath)
+            try:
+                old_stat = os.lstat(old_path)
+            except FileNotFoundError:
+                continue
+            if not stat.S_ISREG(old_stat.st_mode):
+                continue
+            if stat.S_IMODE(old_stat.st_mode) != stat.S_IMODE(os.stat(path).st_mode):
+                continue
+
+            os.remove(path)
+            self._materializer.place(old_path, path)
+
+    def carry_over(self, folder, name):
+        """Bring the output folder `name` over unchanged from the old generation."""
+        old_folder = os.path.join(self.old_folder, name) if self.old_folder else None
+        if old_folder is None or not os.path.isdir(old_folder):
+            return
+
+        self._materializer.materialize(old_folder, os.path.join(folder, name))
+        for key, digest in self.old_files.items():
+            if key.startswith(name + '/'):
+                self.files[key] = digest
+
+    def changes(self):
+        """Return the keys that were added, changed and removed."""
+        return {
+            'added': sorted(key for key in self.files if key not in self.old_files),
+            'changed': sorted(key for key in self.files
+                              if key in self.old_files and self.files[key] != self.old_files[key]),
+            'removed': sorted(key for key in self.old_files if key not in self.files),
+        }
+
+    def changed(self, name=None):
+        """Return whether any output (under the given folder name) changed."""
+        for keys in self.changes().values():
+            for key in keys:
+                if name is None or key.startswith(name + '/'):
+                    return True
+        return False
+
+    def save(self, folder):
+        with open(os.path.join(folder, MANIFEST_FILENAME), 'w') as manifest_file:
+            manifest_file.write(json.dumps({
+                'files': self.files,
+                'changes': self.changes(),
+            }, sort_keys=True, indent=4, separators=(',', ': ')))
+
+    def report(self):
+        """Print what has changed since the last generation."""
+        changes = self.changes()
+        if not self.changed():
+            print('Outputs: nothing changed')
+            return
+
+        print('Outputs: {} added, {} changed, {} removed'.format(
+            len(changes['added']), len(changes['changed']), len(changes['removed'])))
+        for kind, marker in [('added', '+'), ('changed', '*'), ('removed', '-')]:
+            for key in changes[kind]:
+                print('  {} {}'.format(marker, key))
+
+
+class Generations:
+    """Whole generations of outputs, swapped into the irc folder atomically.
+
+    Each generation lives in `generations/<number>`. The `current` symlink
+    points at the live one and `previous` at the one before it, and the
+    output folders (`configs`, `build`, etc) are symlinks into `current`.
+    Swapping `current` with a rename means readers see either the old
+    outputs or the new ones, never a mix or a half-written tree.
+
+    Where symlinks can't be made, the output folders are plain folders in
+    the irc folder instead, with the manifest beside them, and each one is
+    swapped in with renames. The one before lives in `generations/previous`.
+    Readers may then see a mix of old and new output folders mid-commit.
+    """
+
+    def __init__(self, irc_dir, names=OUTPUT_NAMES):
+        self.irc_dir = irc_dir
+        self.names = list(names)
+        self.folder = os.path.join(irc_dir, GENERATIONS_FOLDER)
+        self.current_link = os.path.join(irc_dir, 'current')
+        self.previous_link = os.path.join(irc_dir, 'previous')
+        self.previous_folder = os.path.join(self.folder, 'previous')
+        self._symlinks = None
+
+    @property
+    def symlinks(self):
+        """Whether generations are swapped with symlinks, see symlinks_supported."""
+        if self._symlinks is None:
+            os.makedirs(self.folder, exist_ok=True)
+            self._symlinks = symlinks_supported(self.folder)
+        return self._symlinks
+
+    def _target(self, link):
+        if not os.path.islink(link):
+            return None
+        target = os.path.join(self.irc_dir, os.readlink(link))
+        if os.path.isdir(target):
+            return target
+
+    def current(self):
+        """Return the folder of the live generation, or None."""
+        if not self.symlinks:
+            if os.path.exists(os.path.join(self.irc_dir, MANIFEST_FILENAME)):
+                return self.irc_dir
+            return None
+        return self._target(self.current_link)
+
+    def previous(self):
+        """Return the folder of the generation before the live one, or None."""
+        if not self.symlinks:
+            if os.path.isdir(self.previous_folder):
+                return self.previous_folder
+            return None
+        return self._target(self.previous_link)
+
+    def numbers(self):
+        if not os.path.isdir(self.folder):
+            return []
+        return sorted(int(name) for name in os.listdir(self.folder) if name.isdigit())
+
+    def stage(self):
+        """Return a new, empty staging folder to render a generation into."""
+        os.makedirs(self.folder, exist_ok=True)
+        # staging folders left behind by writes that crashed
+        self.prune()
+        folder = tempfile.mkdtemp(prefix='.staging-', dir=self.folder)
+        # mkdtemp makes it private, but the guest needs to read it
+        os.chmod(folder, 0o755)
+        return folder
+
+    def _link_outputs(self):
+        """Make sure each output folder is a symlink into `current`."""
+        legacy_manifest = os.path.join(self.irc_dir, MANIFEST_FILENAME)
+        if os.path.exists(legacy_manifest):
+            os.remove(legacy_manifest)
+
+        for name in self.names:
+            path = os.path.join(self.irc_dir, name)
+            target = os.path.join('current', name)
+            if os.path.islink(path):
+                if os.readlink(path) != target:
+                    _swap_link(path, target)
+                continue
+
+            # output folder from before we had generations
+            if os.path.isdir(path):
+                old_path = path + '.old'
+                os.rename(path, old_path)
+                _swap_link(path, target)
+                shutil.rmtree(old_path)
+            else:
+                if os.path.lexists(path):
+                    os.remove(path)
+                _swap_link(path, target)
+
+    def _swap_folders(self, staging):
+        """Swap the live output folders and manifest with the ones in staging.
+
+        The live ones end up in staging.
+        """
+        for name in self.names + [MANIFEST_FILENAME]:
+            live = os.path.join(self.irc_dir, name)
+            new = os.path.join(staging, name)
+            old = new + '.old'
+
+            if os.path.lexists(live):
+                os.rename(live, old)
+            if os.path.lexists(new):
+                os.rename(new, live)
+            if os.path.lexists(old):
+                os.rename(old, new)
+
+    def commit(self, staging):
+        """Make the given staging folder the live generation."""
+        if not self.symlinks:
+            self._swap_folders(staging)
+            if os.path.isdir(self.previous_folder):
+                shutil.rmtree(self.previous_folder)
+            # only keep the old generation if there was one
+            if os.path.exists(os.path.join(staging, MANIFEST_FILENAME)):
+                os.rename(staging, self.previous_folder)
+
+            self.prune()
+            return self.irc_dir
+
+        numbers = self.numbers()
+        number = numbers[-1] + 1 if numbers else 1
+        folder = os.path.join(self.folder, str(number))
+        os.rename(staging, folder)
+
+        old = self.current()
+        _swap_link(self.current_link, os.path.join(GENERATIONS_FOLDER, str(number)))
+        if old is not None:
+            _swap_link(self.previous_link, os.path.relpath(old, self.irc_dir))
+        self._link_outputs()
+
+        self.prune()
+        return folder
+
+    def rollback(self):
+        """Swap the live generation with the previous one."""
+        current = self.current()
+        previous = self.previous()
+        if previous is None:
+            raise Exception('There is no previous generation to roll back to')
+
+        if not self.symlinks:
+            self._swap_folders(previous)
+            return current
+
+        _swap_link(self.current_link, os.path.relpath(previous, self.irc_dir))
+        _swap_link(self.previous_link, os.path.relpath(current, self.irc_dir))
+        self._link_outputs()
+        return previous
+
+    def prune(self):
+        """Remove every generation other than the current and previous ones.
+
+        Staging folders left behind are removed too, so this must not be
+        called while a generation is being staged.
+        """
+        if os.path.isdir(self.folder):
+            for name in os.listdir(self.folder):
+                if name.startswith('.staging-'):
+                    shutil.rmtree(os.path.join(self.folder, name))
+
+        keep = set(os.path.realpath(folder) for folder in [self.current(), self.previous()]
+                   if folder is not None)
+        for number in self.numbers():
+            folder = os.path.join(self.folder, str(number))
+            if os.path.realpath(folder) not in keep:
+                shutil.rmtree(folder)
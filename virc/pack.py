@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import json
+import stat
+import hashlib
+import tarfile
+import fnmatch
+
+# never needed to build anything
+VCS_EXCLUDE = ['.git', '.gitmodules', '.svn', '.hg', '.bzr']
+
+# where packed sources get unpacked to on the guest, off the nfs share
+GUEST_SRC_BASE = '/var/tmp/irc/src'
+
+ARCHIVE_EXTENSION = '.tar.gz'
+MANIFEST_FILENAME = 'manifest.json'
+
+
+def excluded(relpath, name, exclude):
+    """Return whether the given entry matches any of the `exclude` glob patterns.
+
+    Patterns are matched against both the entry's name and its path.
+    """
+    for pattern in exclude:
+        if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relpath, pattern):
+            return True
+    return False
+
+
+def source_files(folder, exclude=VCS_EXCLUDE):
+    """Return a sorted list of (relative path, path, stat) for the given folder.
+
+    Entries matching any of the `exclude` glob patterns, either by name or by
+    path relative to the folder, are skipped along with everything under them.
+    Directories are included so empty ones survive packing.
+    """
+    files = []
+    stack = ['']
+    while stack:
+        rel_folder = stack.pop()
+        for entry in os.scandir(os.path.join(folder, rel_folder)):
+            relpath = os.path.join(rel_folder, entry.name) if rel_folder else entry.name
+            if excluded(relpath, entry.name, exclude):
+                continue
+
+            files.append((relpath, entry.path, entry.stat(follow_symlinks=False)))
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(relpath)
+
+    return sorted(files)
+
+
+def fingerprint(files):
+    """Return a digest that changes whenever any of the given files change."""
+    digest = hashlib.sha256()
+    for relpath, path, st in files:
+        digest.update('{}\0{}\0{}\0{}\n'.format(relpath, st.st_mode, st.st_size,
+                                                st.st_mtime_ns).encode('utf-8', 'surrogateescape'))
+    return digest.hexdigest()
+
+
+def total_size(files):
+    """Return the total size of the regular files in the given list."""
+    return sum(st.st_size for relpath, path, st in files if stat.S_ISREG(st.st_mode))
+
+
+def write_archive(files, archive_filename):
+    """Write the given files to a gzipped tarball, replacing it atomically."""
+    tmp_filename = archive_filename + '.tmp'
+    # fast compression, we're packing for a sequential read over the lan
+    with tarfile.open(tmp_filename, 'w:gz', compresslevel=1) as tar:
+        for relpath, path, st in files:
+            tar.add(path, arcname=relpath, recursive=False)
+    os.replace(tmp_filename, archive_filename)
+
+
+def read_manifest(filename):
+    try:
+        with open(filename, 'r') as manifest_file:
+            return json.loads(manifest_file.read())
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def write_manifest(filename, manifest):
+    with open(filename, 'w') as manifest_file:
+        manifest_file.write(json.dumps(manifest, sort_keys=True, indent=4,
+                                       separators=(',', ': ')))
+
+
+def unpack_commands(archive_filename, folder):
+    """Return shell lines that unpack the given archive into a fresh folder."""
+    return [
+        'rm -rf {}'.format(folder),
+        'mkdir -p {}'.format(folder),
+        'tar -xzf {} -C {}'.format(archive_filename, folder),
+    ]
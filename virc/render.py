@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import time
+import importlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .templates import template_cache
+
+
+def default_jobs():
+    """Return how many configs we write at once by default, one per cpu."""
+    return os.cpu_count() or 1
+
+
+class RenderResult:
+    """Outcome of writing a single server's config."""
+
+    def __init__(self, slug, ok, error=None, trace=None, elapsed=0.0):
+        self.slug = slug
+        self.ok = ok
+        self.error = error
+        self.trace = trace
+        self.elapsed = elapsed
+
+
+def render_job(server, folder, info):
+    """Return what's needed to write the given server's config, as plain data.
+
+    Jobs only hold dicts, lists and strings, so they can be sent to another
+    process. The software is built again from its class on the other side.
+    """
+    return {
+        'module': type(server).__module__,
+        'class': type(server).__qualname__,
+        'slug': server.slug,
+        'source_folder': server.source_folder,
+        'rng_seed': server.rng_seed,
+        'node_info': server.info,
+        'folder': folder,
+        'info': info,
+        'template_cache_size': template_cache().max_size,
+    }
+
+
+def _render_one(job):
+    """Write the config described by the given job, returning a RenderResult."""
+    start = time.time()
+    try:
+        template_cache(max_size=job['template_cache_size'])
+
+        software_class = getattr(importlib.import_module(job['module']), job['class'])
+        server = software_class()
+        server.slug = job['slug']
+        server.source_folder = job['source_folder']
+        server.seed_rng(job['rng_seed'])
+        server.info = job['node_info']
+
+        server.write_config(job['folder'], job['info'])
+    except Exception as ex:
+        return RenderResult(job['slug'], False, error='{}: {}'.format(type(ex).__name__, ex),
+                            trace=traceback.format_exc(), elapsed=time.time() - start)
+
+    return RenderResult(job['slug'], True, elapsed=time.time() - start)
+
+
+def render_all(jobs, workers=None):
+    """Write the configs for the given jobs, returning a list of RenderResults.
+
+    Each job writes into its own folder, so they're run in a pool of
+    `workers` processes. A failure in one job does not stop the others.
+    """
+    if workers is None or workers < 1:
+        workers = default_jobs()
+    workers = min(workers, len(jobs))
+
+    # not worth starting processes for
+    if workers <= 1:
+        return [_render_one(job) for job in jobs]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_render_one, job) for job in jobs]
+
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    return results
@@ -11,10 +11,9 @@
 # with this software. If not, see
 # <http://creativecommons.org/publicdomain/zero/1.0/>.
 
-import yaml
-import networkx as nx
 
 from . import map
+from . import yamlio
 
 extension = 'yaml'
 
@@ -49,17 +48,14 @@ def dump(network):
 
     # links
     for link in network.edges():
-        link_nx_info = nx.get_edge_attributes(network, link)[link]
-        link_info = {}
-        for name, dic in link_nx_info:
-            link_info[name] = dic
+        link_info = dict(network[link[0]][link[1]])
 
         sids = tuple(sorted([link[0].info['sid'], link[1].info['sid']]))
 
         info['links'][sids] = link_info
 
     # serializing
-    return yaml.dump(info, default_flow_style=False)
+    return yamlio.dump(info, default_flow_style=False)
 
 
 def load(in_str):
@@ -67,10 +63,8 @@ def load(in_str):
     servers = {}
     network = map.IrcNetwork()
 
-    # WARNING: THIS LOADING METHOD IS UNSAFE,
-    #   BUT REQUIRED BECAUSE OTHERWISE YAML DOES NOT UNDERSTAND THE TUPLE
-    #   DICTIONARY KEYS AND BREAKS. THANKS YAML.
-    nw_info = yaml.load(in_str)
+    # links are keyed by tuples, which the plain safe loader doesn't understand
+    nw_info = yamlio.load(in_str, loader=yamlio.MapLoader)
 
     if not nw_info:
         network.info = {}
@@ -101,12 +95,7 @@ def load(in_str):
         servers[sid] = server
 
     for link, info in nw_info.get('links', {}).items():
-        link_info = []
-        for name, val in info.items():
-            link_info.append((name, val))
-        link_info = tuple(link_info)
-
-        servers[link[0]].link_to(servers[link[1]], info=link_info)
+        servers[link[0]].link_to(servers[link[1]], info=info)
 
     # set network info
     if 'servers' in nw_info:
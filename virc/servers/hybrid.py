@@ -12,49 +12,36 @@
 # <http://creativecommons.org/publicdomain/zero/1.0/>.
 
 import os
-import re
 
+from .. import ircdconf
 from ..base import BaseServer
+from ..lexer import ConfigLexer
+from ..templates import stripped_template
 
-# Removal Regexes
+# Removal Rules
 config_initial_replacements = [
-    re.compile(r'/\*(.|[\r\n])*?\*/'),  # c style comments
-    re.compile(r'\n\s*//.*'),  # c++ style comments
-    re.compile(r'\n\s*#.*'),  # shell style comments
-    (re.compile(r'\n(?:\s*\n)+'), r'\n'),  # remove blank lines
-    (re.compile(r'^[\s\n]*([\S\s]*?)[\s\n]*$'), r'\1\n'),  # remove start/end blank space, make sure newline at end
-
-    re.compile(r'\nmotd \{([^\}]*?)\};'),
-    re.compile(r'\nlisten \{([^\}]*?)\};'),
-    re.compile(r'\noperator \{([^\}]*?)\};'),
-    re.compile(r'\nconnect \{([^\}]*?)\};'),
-    re.compile(r'\ncluster \{([^\}]*?)\};'),
-    re.compile(r'\nshared \{([^\}]*?)\};'),
-    re.compile(r'\nkill \{([^\}]*?)\};'),
-    re.compile(r'\ndeny \{([^\}]*?)\};'),
-    re.compile(r'\nexempt \{([^\}]*?)\};'),
-    re.compile(r'\ngecos \{([^\}]*?)\};'),
-
-    re.compile(r'\nauth \{([^\}]*?)letmein([^\}]*?)\};'),
-    re.compile(r'\nauth \{([^\}]*?)tld([^\}]*?)\};'),
-    re.compile(r'\nresv \{([^\}]*?)helsinki([^\}]*?)\};'),
-
-    # basic config options
-    re.compile(r'\n\s*havent_read_conf.+'),
-    re.compile(r'\n\s*flags = need_ident;'),
-    ('hub = no;', 'hub = yes;'),
-    ('throttle_time = 2 seconds;', 'throttle_time = 0;'),  # else we get locked out during config
-    ('service.someserver', 'services--network-suffix--'),
-    ('stats.someserver', 'stats--network-suffix--'),
+    # c, c++ and shell style comments, blank lines, start/end blank space
+    ConfigLexer(cpp_comments=True, shell_comments=True),
+
+    ircdconf.ConfigEdits(
+        remove_blocks=['motd', 'listen', 'operator', 'connect', 'cluster', 'shared', 'kill',
+                       'deny', 'exempt', 'gecos'],
+        remove_blocks_containing=[('auth', 'letmein'), ('auth', 'tld'), ('resv', 'helsinki')],
+
+        # basic config options
+        remove_entries=[('havent_read_conf', None), ('flags', 'need_ident')],
+        replace_entries=[
+            ('hub', 'no', 'yes'),
+            ('throttle_time', '2 seconds', '0'),  # else we get locked out during config
+        ],
+        replace_in_values=[
+            ('service.someserver', 'services--network-suffix--'),
+            ('stats.someserver', 'stats--network-suffix--'),
+        ],
+    ),
 ]
 
-config_replacements = {
-    'name': (re.compile(r'(serverinfo \{\n\s*name = )[^\;]+(;)'), r'\1"{value}"\2'),
-    'sid': (re.compile(r'(\n\s*sid = )"[0-9a-zA-Z]{3}"(;)'), r'\1"{value}"\2'),
-    'network_name': (r'MyNet', r'{value}'),
-}
-
-CONN_BLOCK = r"""connect {{
+CONN_BLOCK = """connect {{
     name = "{remote_name}";
     host = "127.0.0.1";
     send_password = "{password}";
@@ -63,12 +50,11 @@ CONN_BLOCK = r"""connect {{
     port = {port};
 }};"""
 
-LISTEN_BLOCK = r"""\1\nlisten {{
+LISTEN_BLOCK = """listen {{
     port = {client_port};
-    flags = hidden;
+    flags = {flags};
     port = {link_ports};
-}};
-{connect_blocks}"""
+}};"""
 
 OPERATOR_BLOCK = '''operator {{
     name = "{name}";
@@ -98,61 +84,49 @@ class HybridServer(BaseServer):
     release = '8.2.8'
     url = 'https://github.com/ircd-hybrid/ircd-hybrid/archive/{release}.zip'
 
+    # servers based on hybrid override these to share write_config
+    config_rules = config_initial_replacements
+    network_name_placeholder = 'MyNet'
+    listen_flags = 'hidden'
+    operator_block = OPERATOR_BLOCK
+
     def write_config(self, folder, info):
         """Write config file to the given folder."""
-        # load original config file
+        # load original config file, with useless junk removed
         original_config_file = os.path.join(self.source_folder, 'doc', 'reference.conf')
-        with open(original_config_file, 'r') as config_file:
-            config_data = config_file.read()
+        config_data = stripped_template(original_config_file, self.config_rules)
 
-        # removing useless junk
-        for rep in config_initial_replacements:
-            # replacement
-            if isinstance(rep, (list, tuple)):
-                rep, sub = rep
-
-                # lazy variables
-                sub = sub.replace('--network-suffix--', self.info['network_suffix'])
-
-            # removal
-            else:
-                sub = ''
+        # lazy variables
+        config_data = config_data.replace('--network-suffix--', self.info['network_suffix'])
 
-            if isinstance(rep, str):
-                config_data = config_data.replace(rep, sub)
-            else:
-                config_data = rep.sub(sub, config_data)
+        config = ircdconf.parse(config_data)
 
         # inserting actual values
-        for key, value in self.info.items():
-            if key in config_replacements:
-                rep, sub = config_replacements[key]
-                sub = sub.format(value=value)
-
-                if isinstance(rep, str):
-                    config_data = config_data.replace(rep, sub)
-                else:
-                    config_data = rep.sub(sub, config_data)
+        serverinfo = config.block('serverinfo')
+        serverinfo.set('name', ircdconf.quote(self.info['name']))
+        serverinfo.set('sid', ircdconf.quote(self.info['sid']))
+        config.replace_in_values(self.network_name_placeholder, self.info['network_name'])
 
         # listening ports
-        lregex = re.compile(r'(\nauth \{[^\}]+\};)')
-
-        connect_blocks = []
+        new_blocks = []
 
         ports = []
         for link in self.info['links']:
             ports.append(str(link['port']))
-            connect_blocks.append(CONN_BLOCK.format(remote_name=link['remote_name'],
-                                                    password=link['password'],
-                                                    port=link['port']))
-
-        link_ports = ', '.join(ports)
-
-        sub = LISTEN_BLOCK.format(client_port=self.info['client_port'],
-                                  link_ports=link_ports,
-                                  connect_blocks='\n'.join(connect_blocks))
-
-        config_data = lregex.sub(sub, config_data)
+            new_blocks.append(ircdconf.parse_block(CONN_BLOCK.format(
+                remote_name=link['remote_name'], password=link['password'], port=link['port'])))
+
+        new_blocks.insert(0, ircdconf.parse_block(LISTEN_BLOCK.format(
+            client_port=self.info['client_port'], flags=self.listen_flags,
+            link_ports=', '.join(ports))))
+
+        # these go after the auth blocks, or at the end if there aren't any
+        auth_blocks = config.blocks('auth')
+        for block in new_blocks:
+            if auth_blocks:
+                config.insert_after(auth_blocks[-1], block)
+            else:
+                config.append(block)
 
         # users
         for name, info in info['users'].items():
@@ -163,7 +137,8 @@ class HybridServer(BaseServer):
                 oper_name = info['ircd']['oper_name'] if 'oper_name' in info['ircd'] else name
                 oper_pass = info['ircd']['oper_pass']
 
-                config_data += OPERATOR_BLOCK.format(name=oper_name, password=oper_pass)
+                config.append(ircdconf.parse_block(
+                    self.operator_block.format(name=oper_name, password=oper_pass)))
 
         # writing out config file
         if not os.path.exists(folder):
@@ -171,7 +146,7 @@ class HybridServer(BaseServer):
 
         output_config_file = os.path.join(folder, 'reference.conf')
         with open(output_config_file, 'w') as config_file:
-            config_file.write(config_data)
+            config_file.write(str(config))
 
     def write_build_files(self, folder, src_folder, bin_folder, build_folder, config_folder):
         """Write build files to the given folder."""
@@ -14,50 +14,61 @@
 import os
 import configparser
 
-import yaml
-
+from .. import sql
+from .. import yamlio
 from ..base import BaseServiceBot
 from ..utils import generate_pass
 
 
+PYVA_CLIENT = {
+    'channels': ['py'],
+    'host': 'pyva.rizon.net',
+    'modes': 'ipoU',
+    'name': 'pyva',
+    'nick': 'pyva',
+    'user': 'pyva',
+    'vhost': 'pyva.rizon.net',
+}
+
+
 class AcidServiceBot(BaseServiceBot):
     """Rizon Service Bots."""
     name = 'acid'
     vcs = 'git'
     url = 'https://gitlab.com/rizon/acid.git'
 
+    pack_exclude = ['src/test', '*/src/test']
+
     requires = {
         'ircd': 'plexus4',
         'services': 'anope2',
     }
 
-    def init_info(self, config_folder=None):
-        """Create our info."""
-        self.info['users'] = {}
-
-        # load users from config file
-        config_filename = os.path.join(config_folder, 'pyva.yml')
-        if not os.path.exists(config_filename):
-            return
-        with open(config_filename, 'r') as config_file:
-            config_data = config_file.read()
-
-        conf = yaml.load(config_data)
+    def init_info(self):
+        """Declare our users, generating their passwords."""
+        users = self.info.setdefault('users', {})
 
-        # loop through users
-        for info in conf['clients']:
-            nick = info['nick']
-            user = info['user']
-            password = info['nspass']
+        # passwords are only generated once, so every phase sees the same ones
+        for client in self._pyva_config()['clients']:
+            nick = client['nick']
+            if nick in users:
+                continue
 
-            self.info['users'][nick] = {
+            users[nick] = {
                 'services': {
-                    'password': password,
+                    'password': generate_pass(rng=self.rng),
                     'level': 'acid service bot',
                 },
-                'username': user,
+                'username': client['user'],
             }
 
+    def _pyva_config(self):
+        """Return the example pyva config, with our pyva user added."""
+        conf = yamlio.load_template(os.path.join(self.source_folder, 'pyva', 'pyva.example.yml'))
+
+        conf['clients'].append(dict(PYVA_CLIENT))
+        return conf
+
     def write_config(self, folder, info):
         """Write config file to the given folder."""
         config_files = {
@@ -103,38 +114,20 @@ class AcidServiceBot(BaseServiceBot):
         # pyva config file
         # # # #
         orig, new = config_files['pyva']
-        with open(orig, 'r') as config_file:
-            config_data = config_file.read()
-
-        conf = yaml.load(config_data)
-
-        # loop through users
-        for i, nfo in enumerate(list(conf['clients'])):
-            conf['clients'][i]['nspass'] = generate_pass()
+        conf = self._pyva_config()
 
-        # add pyva user
-        conf['clients'].append({
-            'channels': ['py'],
-            'host': 'pyva.rizon.net',
-            'modes': 'ipoU',
-            'name': 'pyva',
-            'nick': 'pyva',
-            'nspass': generate_pass(),
-            'user': 'pyva',
-            'vhost': 'pyva.rizon.net',
-        })
+        # passwords were generated in init_info
+        for client in conf['clients']:
+            client['nspass'] = self.info['users'][client['nick']]['services']['password']
 
         # and writing it out
         with open(new, 'w') as config_file:
-            config_file.write(yaml.dump(conf))
+            config_file.write(yamlio.dump(conf))
 
         # aciditive config file
         # # # #
         orig, new = config_files['acid']
-        with open(orig, 'r') as config_file:
-            config_data = config_file.read()
-
-        conf = yaml.load(config_data)
+        conf = yamlio.load_template(orig)
 
         # setting info
         conf['uplink']['host'] = '127.0.0.1'
@@ -151,15 +144,12 @@ class AcidServiceBot(BaseServiceBot):
 
         # and writing it out
         with open(new, 'w') as config_file:
-            config_file.write(yaml.dump(conf))
+            config_file.write(yamlio.dump(conf))
 
         # pypsd.yml config file
         # # # #
         orig, new = config_files['conf']
-        with open(orig, 'r') as config_file:
-            config_data = config_file.read()
-
-        conf = yaml.load(config_data)
+        conf = yamlio.load_template(orig)
 
         # setting info
         conf['services']['anope_major'] = 2
@@ -170,20 +160,14 @@ class AcidServiceBot(BaseServiceBot):
 
         # and writing it out
         with open(new, 'w') as config_file:
-            config_file.write(yaml.dump(conf))
+            config_file.write(yamlio.dump(conf))
 
         # sql file
         # # # #
-        sql_lines = []
-        for name, info in info['users'].items():
-            if info.get('level', None) == 'root':
-                # XXX - really bad escaping
-                name = name.replace('\\', '\\\\').replace('"', '\\"')
-                sql_lines.append('INSERT IGNORE INTO `access` (user,flags) '
-                                 'VALUES ("{}",1)\n'.format(name))
-
-        with open(config_files['sql'], 'w') as sql_file:
-            sql_file.write('\n'.join(sql_lines))
+        roots = [(name, 1) for name, info in info['users'].items()
+                 if info.get('level', None) == 'root']
+
+        sql.write_inserts(config_files['sql'], 'access', ['user', 'flags'], roots, ignore=True)
 
     def write_build_files(self, folder, src_folder, bin_folder, build_folder, config_folder):
         """Write build files to the given folder."""
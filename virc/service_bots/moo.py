@@ -12,9 +12,9 @@
 # <http://creativecommons.org/publicdomain/zero/1.0/>.
 
 import os
-import yaml
 import shutil
 
+from .. import yamlio
 from ..base import BaseServiceBot
 from ..utils import generate_pass
 
@@ -25,46 +25,42 @@ class MooServiceBot(BaseServiceBot):
     vcs = 'git'
     url = 'https://gitlab.com/rizon/moo.git'
 
+    pack_exclude = ['src/test', '*/src/test']
+
     requires = {
         'ircd': 'plexus4',
         'services': 'anope2',
     }
 
-    def init_info(self, config_folder=None):
-        """Create our info."""
-        self.info['users'] = {}
-
-        # load users from config file
-        config_filename = os.path.join(config_folder, 'moo.yml')
-        if not os.path.exists(config_filename):
-            return
-        with open(config_filename, 'r') as config_file:
-            config_data = config_file.read()
-
-        conf = yaml.load(config_data)
+    def init_info(self):
+        """Declare our user, generating its passwords."""
+        users = self.info.setdefault('users', {})
 
-        # moo
+        conf = self._moo_config()
         info = conf['general']
-
         nick = info['nick']
-        user = info['ident']
-        ns_password = info['nickserv']['pass']
-        oper_name = info['oper']['name']
-        oper_password = info['oper']['pass']
 
-        self.info['users'][nick] = {
+        # passwords are only generated once, so every phase sees the same ones
+        if nick in users:
+            return
+
+        users[nick] = {
             'services': {
-                'password': ns_password,
+                'password': generate_pass(rng=self.rng),
                 'level': 'moo service bot',
             },
             'ircd': {
                 'oper': True,
-                'oper_name': oper_name,
-                'oper_pass': oper_password,
+                'oper_name': info['oper']['name'],
+                'oper_pass': generate_pass(rng=self.rng),
             },
-            'username': user,
+            'username': info['ident'],
         }
 
+    def _moo_config(self):
+        """Return the template moo config."""
+        return yamlio.load_template(os.path.join(self.source_folder, 'moo.yml.template'))
+
     def write_config(self, folder, info):
         """Write config file to the given folder."""
         modules_folder = os.path.join(folder, 'modules')
@@ -110,17 +106,16 @@ class MooServiceBot(BaseServiceBot):
         # moo config file
         # # # #
         orig, new = config_files['moo']
-        with open(orig, 'r') as config_file:
-            config_data = config_file.read()
-
-        conf = yaml.load(config_data)
+        conf = self._moo_config()
 
         # setting info
         conf['general']['server'] = '127.0.0.1'
         conf['mail']['path'] = '/tmp/idontexistthisisjusttomakemoonotsendmail'
 
-        conf['general']['nickserv']['pass'] = generate_pass()
-        conf['general']['oper']['pass'] = generate_pass()
+        # passwords were generated in init_info
+        user = self.info['users'][conf['general']['nick']]
+        conf['general']['nickserv']['pass'] = user['services']['password']
+        conf['general']['oper']['pass'] = user['ircd']['oper_pass']
 
         conf['plugins'].remove('proxyscan')
         conf['plugins'].remove('servercontrol')
@@ -131,7 +126,7 @@ class MooServiceBot(BaseServiceBot):
 
         # and writing it out
         with open(new, 'w') as config_file:
-            config_file.write(yaml.dump(conf))
+            config_file.write(yamlio.dump(conf))
 
         # grapher
         # # # #
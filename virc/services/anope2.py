@@ -12,36 +12,38 @@
 # <http://creativecommons.org/publicdomain/zero/1.0/>.
 
 import os
-import re
 
+from .. import anopeconf
 from ..base import BaseServices
+from ..lexer import ConfigLexer
+from ..templates import stripped_template
 
 
-# Removal Regexes
+# Removal Rules
 config_initial_replacements = [
-    re.compile(r'(?:[\s\n]|^)/\*(.|[\r\n])*?\*/'),  # c style comments
-    (re.compile(r'(module[\s\n]+?{[\s\n]+?name = "os_session")'), r'#\1'),  # comment out os_session block
-    re.compile(r'\n#[a-zA-Z0-9]+\s*\n?\s*{[^}]+}'),  # remove commented out blocks
-    (re.compile(r'\n(?:\s*\n)+'), r'\n'),  # remove blank lines
-    (re.compile(r'^[\s\n]*([\S\s]*?)[\s\n]*$'), r'\1\n'),  # remove start/end blank space, make sure newline at end
-    ('usemail = yes', 'usemail = no'),  # we don't use mail
-    ('operserv.example.conf', 'operserv.conf'),  # we change session limit settings
+    ConfigLexer(spaced_c_comments=True, collapse=False),  # c style comments
+    anopeconf.ConfigEdits(
+        remove_commented_blocks=True,
+        remove_modules=['os_session'],  # we change session limit settings
+        replace_entries=[('usemail', 'yes', 'no')],  # we don't use mail
+        replace_in_values=[('operserv.example.conf', 'operserv.conf')],
+    ),
+    ConfigLexer(c_comments=False),  # remove blank lines and start/end blank space
 ]
 
-config_replacements = {
-    'name': ('services.localhost.net', '{value}'),
-    'sid': ('#id = "00A"', 'id = "{value}"'),
-    'network_name': ('networkname = "LocalNet"', 'networkname = "{value}"'),
+# ircd software, and the anope protocol module for it
+PROTOCOL_MODULES = {
+    'hybrid': 'hybrid',
+    'plexus4': 'plexus',
+    'inspircd': 'inspircd20',
 }
 
-UPLINK_BLOCK = r"""uplink
-{{
-    host = "127.0.0.1"
-    ipv6 = no
-    ssl = no
-    port = {port}
-    password = "{password}"
-}}"""
+# our names for services levels, and anope's opertype names for them
+OPER_TYPES = {
+    'root': 'Services Root',
+    'acid service bot': 'Acid Service Bot',
+    'moo service bot': 'Moo Service Bot',
+}
 
 OPERATOR_BLOCK = r"""oper
 {{
@@ -119,62 +121,37 @@ class Anope2Services(BaseServices):
         # master config file
         # # # #
         original_config_file = os.path.join(self.source_folder, 'data', 'example.conf')
-        with open(original_config_file, 'r') as config_file:
-            config_data = config_file.read()
-
-        # removing useless junk
-        for rep in config_initial_replacements:
-            # replacement
-            if isinstance(rep, (list, tuple)):
-                rep, sub = rep
-
-            # removal
-            else:
-                sub = ''
-
-            if isinstance(rep, str):
-                config_data = config_data.replace(rep, sub)
-            else:
-                config_data = rep.sub(sub, config_data)
+        config = anopeconf.parse(stripped_template(original_config_file,
+                                                   config_initial_replacements))
 
         # inserting actual values
-        for key, value in self.info.items():
-            if key in config_replacements:
-                rep, sub = config_replacements[key]
-                sub = sub.format(value=value)
-
-                if isinstance(rep, str):
-                    config_data = config_data.replace(rep, sub)
-                else:
-                    config_data = rep.sub(sub, config_data)
-            else:
-                # print('anope2 config: skipping key:', key)
-                ...
+        config.replace_in_values('services.localhost.net', self.info['name'])
+        config.block('serverinfo').set('id', anopeconf.quote(self.info['sid']))
+        config.block('networkinfo').set('networkname',
+                                        anopeconf.quote(self.info['network_name']))
 
         # external ircd module to load
         server_sw = self.info['links'][0]['server_software']
-        if server_sw == 'hybrid':
-            server_sw_name = 'hybrid'
-            config_data = config_data.replace('casemap = "ascii"', 'casemap = "rfc1459"')
-        elif server_sw == 'plexus4':
-            server_sw_name = 'plexus'
-            config_data = config_data.replace('casemap = "ascii"', 'casemap = "rfc1459"')
-        elif server_sw == 'inspircd':
-            server_sw_name = 'inspircd20'
-        else:
+        if server_sw not in PROTOCOL_MODULES:
             raise Exception('unknown server sw in anope config setting: [{}]'.format(server_sw))
+        if server_sw != 'inspircd':
+            config.replace_entries('casemap', '"ascii"', '"rfc1459"')
 
-        config_data = config_data.replace('name = "inspircd20"',
-                                          'name = "{}"'.format(server_sw_name))
+        for block in config.blocks('module'):
+            if anopeconf.unquote(block.get('name')) == 'inspircd20':
+                block.set('name', anopeconf.quote(PROTOCOL_MODULES[server_sw]))
 
-        # replacing uplink block
-        uplink_regex = re.compile(r'uplink[\s\n]*\{[^\}]+\}')
-        uplink = UPLINK_BLOCK.format(port=self.info['links'][0]['port'],
-                                     password=self.info['links'][0]['password'])
-        config_data = uplink_regex.sub(uplink, config_data)
+        # uplink
+        uplink = config.block('uplink')
+        uplink.set('host', '"127.0.0.1"')
+        uplink.set('ipv6', 'no')
+        uplink.set('ssl', 'no')
+        uplink.set('port', str(self.info['links'][0]['port']))
+        uplink.set('password', anopeconf.quote(self.info['links'][0]['password']))
 
         # custom blocks
-        config_data += ADDITIONAL_BLOCKS
+        for block in anopeconf.parse_blocks(ADDITIONAL_BLOCKS):
+            config.append(block)
 
         # opers
         for name, info in info['users'].items():
@@ -186,21 +163,14 @@ class Anope2Services(BaseServices):
                 level = info.get('level', None)  # may also be root
 
             # convert from general names to specific names
-            if level == 'root':
-                level = 'Services Root'
-            elif level == 'acid service bot':
-                level = 'Acid Service Bot'
-            elif level == 'moo service bot':
-                level = 'Moo Service Bot'
+            level = OPER_TYPES.get(level, level)
 
             # only add operator block if they have a valid level
             if level:
                 services_name = info['services']['name'] if 'name' in info['services'] else name
-                password = info['services']['password']
 
-                config_data += OPERATOR_BLOCK.format(level=level, name=services_name,
-                                                     password=password,
-                                                     suffix=self.info['network_suffix'])
+                config.append(anopeconf.parse_block(OPERATOR_BLOCK.format(
+                    level=level, name=services_name, suffix=self.info['network_suffix'])))
 
         # writing out config file
         if not os.path.exists(folder):
@@ -208,28 +178,12 @@ class Anope2Services(BaseServices):
 
         output_config_file = os.path.join(folder, 'services.conf')
         with open(output_config_file, 'w') as config_file:
-            config_file.write(config_data)
+            config_file.write(str(config))
 
         # operserv config file
         # # # #
         original_config_file = os.path.join(self.source_folder, 'data', 'operserv.example.conf')
-        with open(original_config_file, 'r') as config_file:
-            config_data = config_file.read()
-
-        # removing useless junk
-        for rep in config_initial_replacements:
-            # replacement
-            if isinstance(rep, (list, tuple)):
-                rep, sub = rep
-
-            # removal
-            else:
-                sub = ''
-
-            if isinstance(rep, str):
-                config_data = config_data.replace(rep, sub)
-            else:
-                config_data = rep.sub(sub, config_data)
+        config_data = stripped_template(original_config_file, config_initial_replacements)
 
         output_config_file = os.path.join(folder, 'operserv.conf')
         with open(output_config_file, 'w') as config_file:
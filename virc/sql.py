@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+"""SQL files for seeding databases on the guest."""
+
+# rows per INSERT statement, and a cap on statement size well under
+#   MySQL's default max_allowed_packet of 4MB
+DEFAULT_BATCH_ROWS = 1000
+DEFAULT_BATCH_BYTES = 1024 * 1024
+
+DIALECTS = ['mysql', 'sqlite']
+
+# MySQL treats backslashes in strings as escapes, SQLite doesn't
+_MYSQL_ESCAPES = {
+    '\\': '\\\\',
+    "'": "\\'",
+    '\0': '\\0',
+    '\n': '\\n',
+    '\r': '\\r',
+    '\x1a': '\\Z',
+}
+_MYSQL_TABLE = str.maketrans(_MYSQL_ESCAPES)
+
+
+def quote_identifier(name, dialect='mysql'):
+    """Return the given table / column name, quoted."""
+    if dialect == 'mysql':
+        return '`{}`'.format(name.replace('`', '``'))
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def literal(value, dialect='mysql'):
+    """Return the given Python value as an SQL literal."""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float)):
+        return repr(value)
+
+    value = str(value)
+    if dialect == 'mysql':
+        return "'{}'".format(value.translate(_MYSQL_TABLE))
+    return "'{}'".format(value.replace("'", "''"))
+
+
+def insert_statements(table, columns, rows, ignore=False, dialect='mysql',
+                      batch_rows=DEFAULT_BATCH_ROWS, batch_bytes=DEFAULT_BATCH_BYTES):
+    """Yield multi-row INSERT statements that add the given rows to the given table.
+
+    If `ignore` is set, rows that clash with existing keys are skipped.
+    """
+    if dialect not in DIALECTS:
+        raise Exception('Unknown SQL dialect: [{}]'.format(dialect))
+
+    if ignore:
+        verb = 'INSERT IGNORE INTO' if dialect == 'mysql' else 'INSERT OR IGNORE INTO'
+    else:
+        verb = 'INSERT INTO'
+    head = '{} {} ({}) VALUES\n'.format(verb, quote_identifier(table, dialect),
+                                        ', '.join(quote_identifier(column, dialect)
+                                                  for column in columns))
+
+    batch = []
+    size = len(head)
+    for row in rows:
+        if len(row) != len(columns):
+            raise Exception('Row has {} values, expected {}: {}'.format(len(row), len(columns),
+                                                                       row))
+        values = '({})'.format(', '.join(literal(value, dialect) for value in row))
+
+        if batch and (len(batch) >= batch_rows or size + len(values) > batch_bytes):
+            yield head + ',\n'.join(batch) + ';\n'
+            batch = []
+            size = len(head)
+
+        batch.append(values)
+        size += len(values) + 2
+
+    if batch:
+        yield head + ',\n'.join(batch) + ';\n'
+
+
+def write_inserts(filename, table, columns, rows, **options):
+    """Write INSERT statements for the given rows to the given file.
+
+    Returns the number of statements written. Options are passed on to
+    insert_statements.
+    """
+    count = 0
+    with open(filename, 'w') as sql_file:
+        for statement in insert_statements(table, columns, rows, **options):
+            sql_file.write(statement)
+            count += 1
+    return count
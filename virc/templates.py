@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from .cache import base_directory
+
+# bump this when the way rules are applied changes, to ignore old templates
+TEMPLATE_VERSION = 1
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# temporary files older than this were left behind by writes that died
+STALE_TMP_AGE = 60 * 60
+
+
+def apply_rules(data, rules):
+    """Apply the given removal / replacement rules to the given text.
+
+    Each rule is either a pattern to remove, a (pattern, replacement) pair,
+    or a callable that takes and returns the text, such as a
+    lexer.ConfigLexer. Patterns are either plain strings or compiled regexes.
+    """
+    for rep in rules:
+        if callable(rep):
+            data = rep(data)
+            continue
+
+        # replacement
+        if isinstance(rep, (list, tuple)):
+            rep, sub = rep
+
+        # removal
+        else:
+            sub = ''
+
+        if isinstance(rep, str):
+            data = data.replace(rep, sub)
+        else:
+            data = rep.sub(sub, data)
+
+    return data
+
+
+def rules_digest(rules):
+    """Return a digest of the given rules, that changes whenever they do."""
+    described = []
+    for rep in rules:
+        if callable(rep):
+            described.append(rep.describe())
+            continue
+
+        if isinstance(rep, (list, tuple)):
+            rep, sub = rep
+        else:
+            sub = None
+
+        if isinstance(rep, str):
+            described.append(['str', rep, sub])
+        else:
+            described.append(['re', rep.pattern, rep.flags, sub])
+
+    return hashlib.sha256(json.dumps([TEMPLATE_VERSION, described]).encode('utf-8')).hexdigest()
+
+
+class TemplateCache:
+    """Upstream config files with our rules already applied.
+
+    Stripped templates are stored on disk, keyed by a hash of the upstream
+    file plus a hash of the rules, and kept in memory for the rest of the run.
+    Files on disk are kept under `max_size` bytes, removing the least recently
+    used first. Their mtime is bumped each time they're used.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _stripped_filename(self, key):
+        return os.path.join(self.directory, key + '.conf')
+
+    def entries(self):
+        """Return a (filename, size, last used) tuple for each stored template."""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.conf') and entry.is_file():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def total_size(self):
+        return sum(size for filename, size, used in self.entries())
+
+    def evict(self, max_size=None):
+        """Remove least recently used templates until we're under max_size bytes.
+
+        Temporary files left behind by interrupted writes are removed too.
+        Returns the removed (filename, size) pairs.
+        """
+        if max_size is None:
+            max_size = self.max_size
+
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    if time.time() - entry.stat().st_mtime > STALE_TMP_AGE:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+        removed = []
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for filename, size, used in entries)
+        for filename, size, used in entries:
+            if total <= max_size:
+                break
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed.append((filename, size))
+
+        return removed
+
+    def get(self, filename, rules):
+        """Return the contents of the given file, with the given rules applied."""
+        digest = rules_digest(rules)
+
+        # skip reading the file at all if it hasn't changed during this run
+        stat = os.stat(filename)
+        memory_key = (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size, digest)
+        with self._lock:
+            if memory_key in self._memory:
+                return self._memory[memory_key]
+
+        with open(filename, 'r') as original_file:
+            data = original_file.read()
+
+        key = '{}-{}'.format(hashlib.sha256(data.encode('utf-8', 'surrogateescape')).hexdigest(),
+                             digest[:16])
+        stripped_filename = self._stripped_filename(key)
+
+        try:
+            with open(stripped_filename, 'r') as stripped_file:
+                stripped = stripped_file.read()
+            # mark it as recently used, for evict
+            os.utime(stripped_filename)
+        except (IOError, OSError):
+            stripped = apply_rules(data, rules)
+
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_filename = '{}.{}-{}.tmp'.format(stripped_filename, os.getpid(),
+                                                threading.get_ident())
+            with open(tmp_filename, 'w') as stripped_file:
+                stripped_file.write(stripped)
+            os.replace(tmp_filename, stripped_filename)
+
+            if self.total_size() > self.max_size:
+                self.evict()
+
+        with self._lock:
+            self._memory[memory_key] = stripped
+        return stripped
+
+
+_template_cache = None
+
+
+def template_cache(max_size=None):
+    """Return the shared template cache, setting its size limit if one is given."""
+    global _template_cache
+    if _template_cache is None:
+        _template_cache = TemplateCache(os.path.join(base_directory(), 'templates'))
+    if max_size is not None:
+        _template_cache.max_size = max_size
+    return _template_cache
+
+
+def stripped_template(filename, rules):
+    """Return the given config file with the given rules applied, see TemplateCache."""
+    return template_cache().get(filename, rules)
@@ -12,13 +12,48 @@
 # <http://creativecommons.org/publicdomain/zero/1.0/>.
 
 import os
+import bisect
 import random
 
 import names
 import networkx as nx
 
+_name_tables = {}
 
-def generate_pass(minimum_length=9):
+
+def _name_table(kind):
+    """Return the names and cumulative frequencies from one of the names package's lists."""
+    if kind not in _name_tables:
+        table_names = []
+        cumulatives = []
+        with open(names.FILES[kind]) as name_file:
+            for line in name_file:
+                name, _, cumulative, _ = line.split()
+                table_names.append(name)
+                cumulatives.append(float(cumulative))
+        _name_tables[kind] = (table_names, cumulatives)
+
+    return _name_tables[kind]
+
+
+def random_name(kind='first', rng=random):
+    """Return a random name, as common names are in the real world.
+
+    `kind` is 'first' or 'last'. This picks names like the names package
+    does, but with the given random.Random and without reading the list
+    again every time.
+    """
+    if kind == 'first':
+        kind = 'first:{}'.format(rng.choice(('male', 'female')))
+    table_names, cumulatives = _name_table(kind)
+
+    index = bisect.bisect_right(cumulatives, rng.random() * 90)
+    if index >= len(table_names):
+        return ''
+    return table_names[index].capitalize()
+
+
+def generate_pass(minimum_length=9, rng=random):
     """Return a really simple password.
 
     This will NOT actally protect against any attackers. It is just so we can
@@ -26,11 +61,23 @@ def generate_pass(minimum_length=9):
     """
     password = ''
     while len(password) < minimum_length:
-        password = '{}_{}'.format(names.get_last_name().lower(), random.randint(0, 9999))
+        password = '{}_{}'.format(random_name('last', rng=rng).lower(), rng.randint(0, 9999))
 
     return password
 
 
+def human_size(size):
+    """Return the given number of bytes in a human-readable form."""
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if abs(size) < 1024 or unit == 'GiB':
+            break
+        size /= 1024.0
+
+    if unit == 'B':
+        return '{} {}'.format(int(size), unit)
+    return '{:.1f} {}'.format(size, unit)
+
+
 def get_members(zip):
     """get_members for zipfile, stripping common directory prefixes.
 
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# VagrIRC Virc library
+
+# Written in 2015 by Daniel Oaks <daniel@danieloaks.net>
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+"""YAML loading and dumping.
+
+Uses libyaml's C parser and emitter when PyYAML was built with them, which
+is many times faster than the pure-Python ones.
+"""
+
+import os
+import copy
+import threading
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CDumper as Dumper
+except ImportError:
+    from yaml import SafeLoader, Dumper
+
+with_libyaml = SafeLoader.__name__.startswith('C')
+
+
+class MapLoader(SafeLoader):
+    """Safe loader that also builds tuples, which map files use as keys."""
+
+
+def _construct_tuple(loader, node):
+    return tuple(loader.construct_sequence(node))
+
+
+MapLoader.add_constructor('tag:yaml.org,2002:python/tuple', _construct_tuple)
+
+
+def load(text, loader=SafeLoader):
+    """Load the given YAML text."""
+    return yaml.load(text, Loader=loader)
+
+
+def dump(data, **options):
+    """Dump the given data to a YAML string."""
+    return yaml.dump(data, Dumper=Dumper, **options)
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def load_template(filename):
+    """Load the given YAML file, returning a copy that is safe to change.
+
+    Files are only parsed again once they change, so templates read by
+    every config write only get parsed once per run.
+    """
+    stat = os.stat(filename)
+    key = (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+
+    with _templates_lock:
+        data = _templates.get(key)
+
+    if data is None:
+        with open(filename, 'r') as template_file:
+            data = load(template_file.read())
+
+        with _templates_lock:
+            _templates[key] = data
+
+    return copy.deepcopy(data)